@@ -1,11 +1,15 @@
+import json
+import time
+import uuid
 from logging import Logger
 from typing import Generator, Any
 
 import backoff
 from elasticsearch import Elasticsearch, helpers
+from redis import Redis, RedisError
 
 
-from etl_settings import etl_settings, es_settings, Index
+from etl_settings import etl_settings, es_settings, redis_settings, Index
 from etl_utils import get_json_data, coroutine
 from logger import logger
 from state.state import State
@@ -26,10 +30,41 @@ class ElasticsearhClient:
             logger.info(f'Index "{index_name}" created successfully')
 
 
+class InvalidationPublisher:
+    """
+    Notify the API which documents have been written: bump the cache generation of the index
+    (the API retires its cached lists and searches) and publish it with the ids (the API evicts these documents).
+    """
+
+    def __init__(self, redis_url: str = redis_settings.redis_url,
+                 channel: str = redis_settings.redis_invalidation_channel,
+                 generation_key: str = redis_settings.redis_generation_key):
+        self.redis = Redis.from_url(redis_url)
+        self.channel = channel
+        self.generation_key = generation_key
+
+    def publish(self, index_name: str, ids: list[str]) -> int:
+        """Return the number of subscribers that received the message."""
+        key = self.generation_key.format(index_name=index_name)
+        # The counter is seeded with the current time: it keeps growing even if Redis has lost it
+        _, generation = self.redis.pipeline().set(key, int(time.time()), nx=True).incr(key).execute()
+        message = {
+            'id': str(uuid.uuid4()), 'event': 'invalidate', 'index_name': index_name, 'ids': ids, 'generation': generation
+        }
+        return self.redis.publish(self.channel, json.dumps(message))
+
+    def publish_warmup(self) -> int:
+        """Ask the API to warm up its cache (after an ETL cycle)."""
+        message = {'id': str(uuid.uuid4()), 'event': 'warmup'}
+        return self.redis.publish(self.channel, json.dumps(message))
+
+
 class ElasticsearchLoader:
     def __init__(self, logger: Logger):
         self._logger = logger
         self.client = ElasticsearhClient()
+        self.publisher = InvalidationPublisher()
+        self.loaded_docs = 0  # in the current ETL cycle
 
 
     @coroutine
@@ -51,6 +86,25 @@ class ElasticsearchLoader:
 
             helpers.bulk(self.client.es, actions)
             self._logger.info(f'Loaded {len(data)} docs')
+            self.loaded_docs += len(data)
+
+            try:
+                receivers = self.publisher.publish(index_name, [row['uuid'] for row in data])
+                self._logger.info(f'Invalidation of {len(data)} docs published to {receivers} receivers')
+            except RedisError as e:
+                # The API cache will be updated on expiry
+                self._logger.warning(f'Failed to publish invalidation: {e}')
 
             state.set_state(f'{index_name}_last_updated', str(last_updated))
             self._logger.info(f'Set in state: last_updated={last_updated}')
+
+    def finish_cycle(self) -> None:
+        """If anything has been loaded in the cycle, ask the API to warm up its cache."""
+        if not self.loaded_docs:
+            return
+        try:
+            receivers = self.publisher.publish_warmup()
+            self._logger.info(f'Cache warm-up requested from {receivers} receivers')
+        except RedisError as e:
+            self._logger.warning(f'Failed to request cache warm-up: {e}')
+        self.loaded_docs = 0
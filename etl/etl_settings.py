@@ -67,6 +67,21 @@ class ESSettings(BaseSettings):
         }
 
 
+class RedisSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_file=ENV_PATH, env_file_encoding='utf-8', extra='ignore')
+
+    redis_host: str = ...
+    redis_port: int = ...
+    # Channel for notifying the API about the loaded documents (to invalidate its cache)
+    redis_invalidation_channel: str = 'movies_api:invalidation'
+    # Generation counter of the index in the API cache (bumping it retires the cached lists and searches)
+    redis_generation_key: str = 'movies_api:generation:{index_name}'
+
+    @property
+    def redis_url(self) -> str:
+        return f'redis://{self.redis_host}:{self.redis_port}'
+
+
 class ETLSettings(BaseSettings):
     model_config = SettingsConfigDict(env_file=ENV_PATH, env_file_encoding='utf-8', extra='ignore')
 
@@ -77,4 +92,5 @@ class ETLSettings(BaseSettings):
 
 app_postgres_settings = AppPostgresSettings()
 es_settings = ESSettings()
+redis_settings = RedisSettings()
 etl_settings = ETLSettings()
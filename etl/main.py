@@ -66,12 +66,14 @@ def etl_process(conn: psycopg.Connection,
             logger.info(f'{notify=}')
 
             start_etl_process(extractor_coro, state, logger)
+            es_loader.finish_cycle()
             logger.info('ETL process is completed')
 
     # Make periodic queries to the database
     else:
         while True:
             start_etl_process(extractor_coro, state, logger)
+            es_loader.finish_cycle()
             logger.info(f'ETL process is completed. Sleeping {TIME_SLEEP}s')
             time.sleep(TIME_SLEEP)
 
@@ -0,0 +1,49 @@
+import secrets
+from typing import Annotated
+
+from fastapi import APIRouter, HTTPException, status, Depends, Header
+
+from core.config import app_settings, es_settings
+from services.base_service import local_cache_service
+from services.cache_codec import payload_codec
+from services.invalidation import CacheInvalidator, get_cache_invalidator
+from .schemas.admin_schema import CacheGeneration, CacheStatistics
+
+ADMIN_TOKEN_HEADER = 'X-Admin-Token'
+
+
+async def verify_admin_token(token: Annotated[str | None, Header(alias=ADMIN_TOKEN_HEADER)] = None) -> None:
+    """The admin endpoints require the 'admin_api_token' (none is accepted if it is not set)."""
+
+    if not (app_settings.admin_api_token and token
+            and secrets.compare_digest(token.encode(), app_settings.admin_api_token.encode())):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Invalid admin token')
+
+
+router = APIRouter(dependencies=[Depends(verify_admin_token)])
+
+INDEX_NAMES = [index['index_name'] for index in es_settings.es_indexes.values()]
+
+
+@router.post('/cache/{index_name}/generation',
+             response_model=CacheGeneration,
+             summary='Invalidate the cache of the index',
+             description='Bump the cache generation of the index: all its cached lists and searches are retired',
+             )
+async def bump_cache_generation(
+        index_name: str,
+        invalidator: Annotated[CacheInvalidator, Depends(get_cache_invalidator)],
+) -> CacheGeneration:
+    if index_name not in INDEX_NAMES:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Index not found')
+    generation = await invalidator.bump_generation(index_name)
+    return CacheGeneration(index_name=index_name, generation=generation)
+
+
+@router.get('/cache/stats',
+            response_model=CacheStatistics,
+            summary='Cache statistics',
+            description='Local cache hits/misses and compression ratio/time of the worker',
+            )
+async def cache_stats() -> CacheStatistics:
+    return CacheStatistics(local_cache=local_cache_service.stats.to_dict(), compression=payload_codec.stats.to_dict())
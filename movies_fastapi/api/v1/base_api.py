@@ -1,7 +1,8 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
 from fastapi.responses import RedirectResponse
 
 from core.config import app_settings
+from core.metrics import render_metrics
 
 
 router = APIRouter()
@@ -10,3 +11,9 @@ router = APIRouter()
 @router.get('/', description='Redirect to doc page', include_in_schema=False)
 async def root_handler():
     return RedirectResponse(app_settings.docs_url)
+
+
+@router.get('/metrics', description='Metrics in the Prometheus format', include_in_schema=False)
+async def metrics_handler() -> Response:
+    content, media_type = render_metrics()
+    return Response(content=content, media_type=media_type)
@@ -2,16 +2,21 @@ from typing import Annotated
 from typing import Annotated
 from uuid import UUID
 
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Response
 
+from core.config import es_settings
 from services.film_service import FilmService, get_film_service
+from .schemas.batch_schema import UUIDBatch
 from .schemas.film_schema import FilmBase, FilmDetails, FilmQueryExact
 from .schemas.query_params import FilmListParam, FilmTotalParam
+from .utils import concurrency_limit, set_result_headers, response_cache
 
 # from services.film_service import FilmService, get_film_service
 
 router = APIRouter()
 
+INDEX_NAME = es_settings.es_indexes['movies']['index_name']
+
 
 # TODO [Optional]
 # Get persons for certain film (search by film title)
@@ -20,7 +25,9 @@ router = APIRouter()
             response_model=FilmDetails,
             summary='Get film information (exact match)',
             description='Get full information about the film by its uuid',
+            dependencies=[Depends(concurrency_limit('details'))],
             )
+@response_cache(FilmDetails, index_name=INDEX_NAME)
 async def film_details(
         film_id: UUID,
         film_service: Annotated[FilmService, Depends(get_film_service)],
@@ -32,21 +39,44 @@ async def film_details(
     return film
 
 
+@router.post('/batch',
+             response_model=list[FilmDetails],
+             summary='Get films by their uuids (batch)',
+             description='Get full information about several films by their uuids in one request'
+                         ' (not found ones are skipped)',
+             dependencies=[Depends(concurrency_limit('details'))],
+             )
+@response_cache(list[FilmDetails], index_name=INDEX_NAME)
+async def film_batch(
+        film_ids: UUIDBatch,
+        film_service: Annotated[FilmService, Depends(get_film_service)],
+) -> list[FilmDetails]:
+    films = await film_service.get_films_by_uuids(film_ids.uuids)
+    if not films:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Films not found')
+
+    return films
+
+
 @router.post('/exact_search',
              response_model=list[FilmDetails],
              summary='Get films by their fields (exact match)',
              description='Get full information about the films by their fields'
                          ' (uuid, title, imdb_rating)',
+             dependencies=[Depends(concurrency_limit('list'))],
              )
+@response_cache(list[FilmDetails], index_name=INDEX_NAME)
 async def film_by_fields(
         film_data: FilmQueryExact,
         film_service: Annotated[FilmService, Depends(get_film_service)],
+        response: Response,
 ) -> list[FilmDetails]:
     films = await film_service.get_film_by_fields(film_data)
     if not films:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Films not found')
 
-    return films
+    set_result_headers(response, films)
+    return films['items']
 
 
 # TODO Problem: Validation for query params in Basemodel (film_schema.py) doesn't work properly: Error 500 instead of 422
@@ -76,28 +106,36 @@ async def film_by_fields(
             response_model=list[FilmDetails],
             summary='Film fuzzy search',
             description='Search for films based on the words from the title',
+            dependencies=[Depends(concurrency_limit('search'))],
             )
+@response_cache(list[FilmDetails], index_name=INDEX_NAME)
 async def film_search(
         film_service: Annotated[FilmService, Depends(get_film_service)],
         query_params: Annotated[FilmTotalParam, Depends()],
+        response: Response,
 ) -> list[FilmDetails]:
     films = await film_service.get_films_by_search(query_params)
     if not films:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Films not found')
 
-    return films
+    set_result_headers(response, films)
+    return films['items']
 
 
 @router.get('',
             response_model=list[FilmBase],
             summary='List of films',
             description='List of films with pagination, filtering by genre and sorting by rating',
+            dependencies=[Depends(concurrency_limit('list'))],
             )
+@response_cache(list[FilmBase], index_name=INDEX_NAME)
 async def film_list(
         film_service: Annotated[FilmService, Depends(get_film_service)],
         query_params: Annotated[FilmListParam, Depends()],
+        response: Response,
 ) -> list[FilmBase]:
     films = await film_service.get_films_list(query_params)
     if not films:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Films not found')
-    return films
+    set_result_headers(response, films)
+    return films['items']
@@ -1,24 +1,32 @@
 from typing import Annotated
 
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Response
 
+from core.config import es_settings
 from services.genre_service import GenreService, get_genre_service
 from .schemas.genre_schema import GenreBase
 from .schemas.query_params import PageParam
+from .utils import concurrency_limit, set_result_headers, response_cache
 
 router = APIRouter()
 
+INDEX_NAME = es_settings.es_indexes['genres']['index_name']
+
 
 @router.get('',
             response_model=list[GenreBase],
             summary='List of genres',
             description='List of genres with pagination',
+            dependencies=[Depends(concurrency_limit('list'))],
             )
+@response_cache(list[GenreBase], index_name=INDEX_NAME)
 async def genre_list(
         genre_service: Annotated[GenreService, Depends(get_genre_service)],
         query_params: Annotated[PageParam, Depends()],
+        response: Response,
 ) -> list[GenreBase]:
     genres = await genre_service.get_genres_list(query_params)
     if not genres:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Genres not found')
-    return genres
+    set_result_headers(response, genres)
+    return genres['items']
@@ -2,39 +2,50 @@ from http import HTTPStatus
 from typing import Annotated, Any
 from uuid import UUID
 
-from fastapi import APIRouter, HTTPException, status, Depends, Request
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Response
 
+from core.config import es_settings
 from services.person_service import PersonService, get_person_service
+from .schemas.batch_schema import UUIDBatch
 from .schemas.film_schema import FilmBase, FilmDetails
 from services.film_service import FilmService, get_film_service
 from .schemas.person_schema import PersonDetails
 from .schemas.query_params import SearchParam
+from .utils import concurrency_limit, set_result_headers, response_cache
 
 router = APIRouter()
 
+INDEX_NAME = es_settings.es_indexes['persons']['index_name']
+
 
 @router.get('/exact_search/name/{full_name}',
             response_model=list[PersonDetails],
             summary='Get person/s (exact match)',
             description='Get full information about person/s by full_name',
+            dependencies=[Depends(concurrency_limit('list'))],
             )
+@response_cache(list[PersonDetails], index_name=INDEX_NAME)
 async def person_by_name(
         full_name: str,
         person_service: Annotated[PersonService, Depends(get_person_service)],
+        response: Response,
 ) -> list[PersonDetails]:
 
     persons = await person_service.get_person_by_name(full_name)
     if not persons:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Persons not found')
 
-    return persons
+    set_result_headers(response, persons)
+    return persons['items']
 
 
 @router.get('/exact_search/{person_id}',
             response_model=PersonDetails,
             summary='Get person information (exact match)',
             description='Get full information about person by its uuid',
+            dependencies=[Depends(concurrency_limit('details'))],
             )
+@response_cache(PersonDetails, index_name=INDEX_NAME)
 async def person_details(
         person_id: UUID,
         person_service: Annotated[PersonService, Depends(get_person_service)],
@@ -47,17 +58,41 @@ async def person_details(
     return person
 
 
+@router.post('/batch',
+             response_model=list[PersonDetails],
+             summary='Get persons by their uuids (batch)',
+             description='Get full information about several persons by their uuids in one request'
+                         ' (not found ones are skipped)',
+             dependencies=[Depends(concurrency_limit('details'))],
+             )
+@response_cache(list[PersonDetails], index_name=INDEX_NAME)
+async def person_batch(
+        person_ids: UUIDBatch,
+        person_service: Annotated[PersonService, Depends(get_person_service)],
+) -> list[PersonDetails]:
+
+    persons = await person_service.get_persons_by_uuids(person_ids.uuids)
+    if not persons:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Persons not found')
+
+    return persons
+
+
 @router.get('/search',
             response_model=list[PersonDetails],
             summary='Person fuzzy search',
             description='Search for persons based on the words from the full name',
+            dependencies=[Depends(concurrency_limit('search'))],
             )
+@response_cache(list[PersonDetails], index_name=INDEX_NAME)
 async def person_search(
         person_service: Annotated[PersonService, Depends(get_person_service)],
         query_params: Annotated[SearchParam, Depends()],
+        response: Response,
 ) -> list[PersonDetails]:
     persons = await person_service.get_persons_by_search(query_params)
     if not persons:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Persons not found')
 
-    return persons
+    set_result_headers(response, persons)
+    return persons['items']
@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+
+
+class CacheGeneration(BaseModel):
+    index_name: str
+    generation: int
+
+
+class CacheStatistics(BaseModel):
+    """Statistics of the worker that has handled the request."""
+
+    local_cache: dict[str, int]
+    compression: dict[str, int | float]
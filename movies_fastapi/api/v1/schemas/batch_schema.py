@@ -0,0 +1,10 @@
+from typing import Annotated
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+from core.config import app_settings
+
+
+class UUIDBatch(BaseModel):
+    uuids: Annotated[list[UUID], Field(min_length=1, max_length=app_settings.batch_max_size)]
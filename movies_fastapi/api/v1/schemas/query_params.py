@@ -24,17 +24,23 @@ class PageParam(BaseModel):
     page_size: Annotated[int, Query(app_settings.page_size, ge=1, description='Количество записей на странице')]
 
 
+class CursorParam(BaseModel):
+    cursor: Annotated[str | None, Query(None, description='Курсор следующей страницы (из заголовка X-Next-Cursor), '
+                                                          '"*" - начать обход с первой страницы. '
+                                                          'При наличии курсора page_number не используется')]
+
+
 class GenreNameFilter(BaseModel):
     genre_name: Annotated[str | None, Query(None, description='Фильтрация по жанру')]
 
 
-class FilmListParam(PageParam, GenreNameFilter):
+class FilmListParam(PageParam, GenreNameFilter, CursorParam):
     model_config = ConfigDict(use_enum_values=True)
 
     sort: Annotated[SortRating | None, Query(SortRating.DESC.value, description='Поле сортировки')]
 
 
-class SearchParam(PageParam):
+class SearchParam(PageParam, CursorParam):
     query: Annotated[str | None, Query(..., min_length=1, description='Строка запроса для поиска')]
 
 
@@ -0,0 +1,137 @@
+import functools
+import inspect
+import logging
+from typing import Any, AsyncIterator, Callable
+from uuid import UUID
+
+import orjson
+from fastapi import Request, Response, status
+from pydantic import BaseModel, TypeAdapter
+
+from core.circuit_breaker import is_stale_response
+from core.concurrency import concurrency_limiters
+from core.config import cache_settings
+from core.timing import timed
+from core.exeptions import NotModified
+from core.utils import conditional_request, etag_matches, index_generations, make_etag, params_digest
+from db.redis import get_redis
+from services.base_service import RedisCacheService, SearchResult
+
+logger = logging.getLogger(__name__)
+
+TOTAL_COUNT_HEADER = 'X-Total-Count'
+TOTAL_COUNT_RELATION_HEADER = 'X-Total-Count-Relation'
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+ETAG_HEADER = 'etag'
+JSON_MEDIA_TYPE = 'application/json'
+REQUEST_ARGUMENT = 'cache_request'
+
+
+def set_result_headers(response: Response, result: SearchResult) -> None:
+    """
+    Put the total number of hits into the response headers ('gte' relation means a lower bound)
+    and the cursor of the next page (if there is one).
+    """
+
+    response.headers[TOTAL_COUNT_HEADER] = str(result['total'])
+    response.headers[TOTAL_COUNT_RELATION_HEADER] = result['total_relation']
+    if next_cursor := result.get('next_cursor'):
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+
+def concurrency_limit(name: str) -> Callable[[], AsyncIterator[None]]:
+    """
+    Dependency of an endpoint: the request holds a slot of the 'name' limiter (see 'AppSettings.concurrency_limits')
+    while it is handled, so e.g. a burst of expensive searches can't starve the cheap lookups.
+    """
+
+    limiter = concurrency_limiters[name]
+
+    async def dependency() -> AsyncIterator[None]:
+        async with limiter.slot():
+            yield
+
+    return dependency
+
+
+def _request_params(kwargs: dict[str, Any]) -> dict[str, Any]:
+    """Params of the request among the endpoint arguments (services and the response are skipped)."""
+
+    return {
+        name: value for name, value in kwargs.items()
+        if value is None or isinstance(value, (BaseModel, UUID, str, int, float))
+    }
+
+
+def response_cache(response_model: Any, index_name: str) -> Callable:
+    """
+    Decorator for a read endpoint: response-level cache and conditional GET.
+    The ETag is made of the ETags of the cache entries the response is built from ('ConditionalRequest'),
+    so a matching 'If-None-Match' gets 304 before the data is deserialized, validated and serialized
+    (only for GET/HEAD: a POST, e.g. a batch read, always gets the body). Without cache entries the ETag
+    is the digest of the body.
+    In the 'response_cache_enabled' mode the final JSON body (with the ETag and the headers set by the endpoint)
+    is stored in Redis once, and a hit is returned as a raw 'Response': no deserialization,
+    no model validation, no serialization (and no Elasticsearch for 304).
+    Errors (e.g. 404) and stale responses (served while Elasticsearch is unavailable) are not cached here.
+    """
+
+    adapter = TypeAdapter(response_model)
+
+    def decorator(endpoint: Callable) -> Callable:
+        prefix = '{}:v{}:response:{}'.format(
+            cache_settings.cache_key_prefix, cache_settings.cache_key_version, endpoint.__name__
+        )
+
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            request: Request = kwargs.pop(REQUEST_ARGUMENT)
+            if not (cache_settings.response_cache_enabled or cache_settings.etag_enabled):
+                return await endpoint(*args, **kwargs)
+            # A conditional request is only a safe method one (RFC 9110): 304 is not an answer to a POST
+            if_none_match = (request.headers.get('if-none-match')
+                             if cache_settings.etag_enabled and request.method in ('GET', 'HEAD') else None)
+
+            cache_service = RedisCacheService(await get_redis())
+            params = params_digest(_request_params(kwargs))
+            key = '{}:{}:g{}:{}'.format(prefix, index_name, index_generations.get(index_name), params)
+            if cache_settings.response_cache_enabled:
+                if cached := await cache_service.retrieve_raw_from_cache(key=key):
+                    # '<headers json>\n<body>' (JSON made by orjson and pydantic has no new lines)
+                    headers, body = cached.split(b'\n', 1)
+                    headers = orjson.loads(headers)
+                    logger.debug('{}: Retrieve response from cache'.format(endpoint.__name__))
+                    if etag_matches(if_none_match, headers.get(ETAG_HEADER)):
+                        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+                    return Response(content=body, media_type=JSON_MEDIA_TYPE, headers=headers)
+
+            with conditional_request('{}:{}'.format(prefix, params), if_none_match) as conditional:
+                try:
+                    result = await endpoint(*args, **kwargs)
+                except NotModified as e:
+                    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={ETAG_HEADER: e.etag})
+            with timed('validate'):
+                validated = adapter.validate_python(result)
+            with timed('serialize'):
+                body = adapter.dump_json(validated)
+            headers = {}
+            for argument in kwargs.values():
+                if isinstance(argument, Response):
+                    headers = {name: value for name, value in argument.headers.items() if name != 'content-length'}
+            if cache_settings.etag_enabled:
+                headers[ETAG_HEADER] = conditional.etag or make_etag(body)
+            if cache_settings.response_cache_enabled and not is_stale_response():
+                await cache_service.add_raw_to_cache(key=key, value=orjson.dumps(headers) + b'\n' + body)
+            if cache_settings.etag_enabled and etag_matches(if_none_match, headers[ETAG_HEADER]):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+            return Response(content=body, media_type=JSON_MEDIA_TYPE, headers=headers)
+
+        # The request is needed for 'If-None-Match': add it to the signature seen by FastAPI
+        signature = inspect.signature(endpoint)
+        wrapper.__signature__ = signature.replace(parameters=[
+            *signature.parameters.values(),
+            inspect.Parameter(REQUEST_ARGUMENT, inspect.Parameter.KEYWORD_ONLY, annotation=Request),
+        ])
+        return wrapper
+
+    return decorator
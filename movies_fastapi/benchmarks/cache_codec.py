@@ -0,0 +1,46 @@
+"""
+Benchmark: size and encode/decode time of the cache payloads per codec ('cache_compression_codec').
+
+The payload is a list of 'FilmDetails' with casts (as cached by the film search).
+No Redis is needed: the payloads are generated. 'zstd' and 'lz4' are measured if installed.
+
+Usage (from the movies_fastapi folder):
+    python -m benchmarks.cache_codec --films 50 --persons 10 --iterations 500
+"""
+
+import argparse
+import time
+
+import orjson
+
+from benchmarks.response_cache import make_films
+from services.cache_codec import PayloadCodec, _codecs
+
+
+def main(films: int, persons: int, iterations: int) -> None:
+    payload = orjson.dumps(make_films(films, persons))
+    print(f'{films} films x {persons} actors: {len(payload)} bytes, {iterations} iterations')
+    print('{:<6} {:>10} {:>7} {:>12} {:>12}'.format('codec', 'bytes', 'ratio', 'encode, us', 'decode, us'))
+
+    for name in _codecs():
+        codec = PayloadCodec(name, min_size=0)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            encoded = codec.encode(payload)
+        encode_us = (time.perf_counter() - start) / iterations * 1_000_000
+        start = time.perf_counter()
+        for _ in range(iterations):
+            codec.decode(encoded)
+        decode_us = (time.perf_counter() - start) / iterations * 1_000_000
+        print('{:<6} {:>10} {:>7.2f} {:>12.1f} {:>12.1f}'.format(
+            name, len(encoded), len(payload) / len(encoded), encode_us, decode_us
+        ))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--films', type=int, default=50)
+    parser.add_argument('--persons', type=int, default=10)
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+    main(args.films, args.persons, args.iterations)
@@ -0,0 +1,90 @@
+"""
+Benchmark: getting a document by id with a realtime document GET vs a search with a 'term' filter.
+
+Runs the same random ids through both ways with the given concurrency against the Elasticsearch
+from the settings ('ES_HOST', 'ES_PORT') and prints throughput and latency percentiles.
+
+Usage (from the movies_fastapi folder):
+    python -m benchmarks.get_by_id --index movies --requests 5000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import Awaitable, Callable
+
+from elasticsearch import AsyncElasticsearch
+from elasticsearch_dsl import AsyncSearch
+
+from core.config import es_settings
+
+
+async def get_by_doc_get(es: AsyncElasticsearch, index_name: str, doc_id: str) -> dict:
+    response = await es.get(index=index_name, id=doc_id)
+    return response['_source']
+
+
+async def get_by_term_search(es: AsyncElasticsearch, index_name: str, doc_id: str) -> dict:
+    s = AsyncSearch(using=es, index=index_name).filter('term', uuid=doc_id)
+    response = await s.execute()
+    return response.hits.hits[0]['_source'].to_dict()
+
+
+async def run(
+        es: AsyncElasticsearch,
+        index_name: str,
+        doc_ids: list[str],
+        concurrency: int,
+        get: Callable[[AsyncElasticsearch, str, str], Awaitable[dict]],
+) -> tuple[float, list[float]]:
+    """Return the total time and the latencies (sec) of all requests."""
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(doc_id: str) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await get(es, index_name, doc_id)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(doc_id) for doc_id in doc_ids))
+    return time.perf_counter() - start, latencies
+
+
+def report(name: str, total_time: float, latencies: list[float]) -> None:
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        '{:<12} {:>8.0f} req/s   p50 {:>7.2f} ms   p95 {:>7.2f} ms   p99 {:>7.2f} ms'.format(
+            name, len(latencies) / total_time, quantiles[49] * 1000, quantiles[94] * 1000, quantiles[98] * 1000
+        )
+    )
+
+
+async def main(index_name: str, requests: int, concurrency: int) -> None:
+    es = AsyncElasticsearch(**es_settings.es_client_options)
+    try:
+        s = AsyncSearch(using=es, index=index_name).source(False)[:1000]
+        ids = [hit.meta.id async for hit in s]
+        if not ids:
+            raise SystemExit(f'Index "{index_name}" is empty')
+        doc_ids = [random.choice(ids) for _ in range(requests)]
+
+        print(f'{requests} requests, concurrency {concurrency}, index "{index_name}" ({len(ids)} ids)')
+        for name, get in (('doc GET', get_by_doc_get), ('term search', get_by_term_search)):
+            await run(es, index_name, doc_ids[:concurrency], concurrency, get)  # warm up
+            report(name, *await run(es, index_name, doc_ids, concurrency, get))
+    finally:
+        await es.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--index', default=es_settings.es_indexes['movies']['index_name'])
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.index, args.requests, args.concurrency))
@@ -0,0 +1,103 @@
+"""
+Benchmark: time spent by the request (the calling code) per log record
+for the synchronous handler, the queue-based one ('log_queue_enabled') and the queue with sampling ('log_sample_rates').
+
+The records are the hot-path messages of the cache decorator, written with the app format ('core.logger.LOG_FORMAT')
+to a file (or to stderr with '--stderr'). '--write-latency-us' emulates a slow sink (a console piped
+to a busy log collector blocks the write): that is where the queue pays off, with a fast sink
+the writing thread only competes for the GIL. Several coroutines log concurrently, as the requests of one worker do.
+
+Usage (from the movies_fastapi folder):
+    python -m benchmarks.logging_throughput --records 20000 --sample-rate 0.1 --write-latency-us 50
+"""
+
+import argparse
+import asyncio
+import logging
+import queue
+import sys
+import tempfile
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from core.logger import LOG_FORMAT, SamplingFilter
+
+
+class SlowStream:
+    """A stream whose writes block for 'latency_sec' (the GIL is released, as in a real blocking write)."""
+
+    def __init__(self, stream, latency_sec: float):
+        self.stream = stream
+        self.latency_sec = latency_sec
+
+    def write(self, data: str) -> int:
+        time.sleep(self.latency_sec)
+        return self.stream.write(data)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+
+def make_handler(stream) -> logging.Handler:
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    return handler
+
+
+async def emit(logger: logging.Logger, records: int, concurrency: int) -> None:
+    async def request(n: int) -> None:
+        for i in range(n):
+            logger.info('{}.{}: Retrieve data from cache'.format('ElasticsearchDBService', 'get_list'))
+            if i % 10 == 0:
+                await asyncio.sleep(0)
+
+    await asyncio.gather(*[request(records // concurrency) for _ in range(concurrency)])
+
+
+def measure(name: str, logger: logging.Logger, records: int, concurrency: int) -> float:
+    start = time.perf_counter()
+    asyncio.run(emit(logger, records, concurrency))
+    elapsed = time.perf_counter() - start
+    print('{:<14} {:>8.2f} us per record {:>12.0f} records/s'.format(
+        name, elapsed / records * 1_000_000, records / elapsed
+    ))
+    return elapsed
+
+
+def main(records: int, concurrency: int, sample_rate: float, stderr: bool, write_latency_us: float) -> None:
+    stream = sys.stderr if stderr else tempfile.TemporaryFile('w')
+    if write_latency_us:
+        stream = SlowStream(stream, write_latency_us / 1_000_000)
+    print(f'{records} records, {concurrency} concurrent coroutines, write latency {write_latency_us} us')
+
+    sync_logger = logging.getLogger('benchmark.sync')
+    sync_logger.addHandler(make_handler(stream))
+    sync_time = measure('sync', sync_logger, records, concurrency)
+
+    results = {}
+    for name, rate in (('queue', None), ('queue+sampling', sample_rate)):
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, make_handler(stream))
+        queue_logger = logging.getLogger(f'benchmark.{name}')
+        queue_logger.addHandler(QueueHandler(log_queue))
+        if rate is not None:
+            queue_logger.addFilter(SamplingFilter(rate))
+        listener.start()
+        results[name] = measure(name, queue_logger, records, concurrency)
+        listener.stop()  # the writing thread drains the queue, not measured: the request doesn't wait for it
+
+    for name, elapsed in results.items():
+        print('{}: x{:.1f} faster than sync for the request'.format(name, sync_time / elapsed))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--sample-rate', type=float, default=0.1)
+    parser.add_argument('--stderr', action='store_true')
+    parser.add_argument('--write-latency-us', type=float, default=0)
+    args = parser.parse_args()
+    logging.getLogger('benchmark').propagate = False
+    logging.getLogger('benchmark').setLevel(logging.INFO)
+    main(args.records, args.concurrency, args.sample_rate, args.stderr, args.write_latency_us)
@@ -0,0 +1,92 @@
+"""
+Benchmark: CPU time of a cache hit for the data cache vs the response cache ('response_cache_enabled').
+
+Data cache hit: 'orjson.loads' of the cached data, validation against the response model
+and serialization of the response (the same FastAPI functions as for a real request).
+Response cache hit: the cached bytes are returned as a 'Response' as is.
+No Elasticsearch or Redis is needed: the payloads are generated.
+
+Usage (from the movies_fastapi folder):
+    python -m benchmarks.response_cache --films 50 --persons 10 --iterations 2000
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+import orjson
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from pydantic import TypeAdapter
+
+from api.v1.schemas.film_schema import FilmDetails
+
+
+def make_films(films: int, persons: int) -> list[dict]:
+    def person() -> dict:
+        return {'uuid': str(uuid.uuid4()), 'full_name': 'Person Name'}
+
+    return [
+        {
+            'uuid': str(uuid.uuid4()),
+            'title': f'Film {i}',
+            'imdb_rating': 7.5,
+            'description': 'The Imperial Forces, under orders from cruel Darth Vader, hold Princess Leia hostage...',
+            'genres': [{'uuid': str(uuid.uuid4()), 'name': 'Action'}],
+            'actors': [person() for _ in range(persons)],
+            'writers': [person() for _ in range(persons // 2)],
+            'directors': [person()],
+        }
+        for i in range(films)
+    ]
+
+
+async def data_cache_hit(field, cached: bytes) -> bytes:
+    data = orjson.loads(cached)
+    content = await serialize_response(field=field, response_content=data, is_coroutine=True)
+    return ORJSONResponse(content).body
+
+
+async def response_cache_hit(cached: bytes) -> bytes:
+    headers, body = cached.split(b'\n', 1)
+    return Response(content=body, media_type='application/json', headers=orjson.loads(headers)).body
+
+
+async def measure(name: str, iterations: int, hit) -> float:
+    start = time.process_time()
+    for _ in range(iterations):
+        await hit()
+    cpu_us = (time.process_time() - start) / iterations * 1_000_000
+    print('{:<16} {:>10.1f} us CPU per request'.format(name, cpu_us))
+    return cpu_us
+
+
+async def main(films: int, persons: int, iterations: int) -> None:
+    response_model = list[FilmDetails]
+    field = create_response_field(name='Response', type_=response_model, mode='serialization')
+    adapter = TypeAdapter(response_model)
+
+    data = make_films(films, persons)
+    data_cached = orjson.dumps(data)
+    response_cached = orjson.dumps({'x-total-count': str(films)}) + b'\n' + adapter.dump_json(
+        adapter.validate_python(data)
+    )
+    print(f'{films} films x {persons} actors: {len(data_cached)} bytes, {iterations} iterations')
+
+    data_cpu = await measure('data cache', iterations, lambda: data_cache_hit(field, data_cached))
+    response_cpu = await measure('response cache', iterations, lambda: response_cache_hit(response_cached))
+    print('CPU saved per request: {:.1f} us ({:.0f}%)'.format(
+        data_cpu - response_cpu, (data_cpu - response_cpu) / data_cpu * 100
+    ))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--films', type=int, default=50)
+    parser.add_argument('--persons', type=int, default=10)
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(args.films, args.persons, args.iterations))
@@ -0,0 +1,142 @@
+import contextlib
+import enum
+import logging
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Callable, Iterator
+
+from core.exeptions import CircuitOpenError
+from core.metrics import CIRCUIT_REJECTED, CIRCUIT_STATE
+
+logger = logging.getLogger(__name__)
+
+STALE_RESPONSE_HEADER = 'X-Stale-Response'
+
+# Flags of the current request (a mutable dict: the tasks started by the request share it),
+# set by 'StaleResponseMiddleware'; None outside a request
+_response_flags: ContextVar[dict[str, bool] | None] = ContextVar('response_flags', default=None)
+
+
+def start_response_flags() -> dict[str, bool]:
+    flags = {}
+    _response_flags.set(flags)
+    return flags
+
+
+def mark_stale_response() -> None:
+    """The response of the current request contains stale data (the fallback copy of the cache)."""
+
+    flags = _response_flags.get()
+    if flags is not None:
+        flags['stale'] = True
+
+
+def is_stale_response() -> bool:
+    flags = _response_flags.get()
+    return bool(flags and flags.get('stale'))
+
+
+class CircuitState(enum.IntEnum):
+    CLOSED = 0
+    OPEN = 1
+    HALF_OPEN = 2
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker: if too many of the last 'window_size' calls (at least 'min_calls') have failed
+    or have been slower than 'slow_call_sec', the circuit opens and the calls fail fast ('CircuitOpenError')
+    for 'open_sec' instead of piling up on the degraded service. Then one trial call is let through (half-open):
+    its success closes the circuit, its failure opens it again.
+    'is_failure' tells the failures from the normal errors (e.g. a missing document).
+    The state is per worker.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            is_failure: Callable[[Exception], bool],
+            failure_rate: float = 0.5,
+            slow_call_sec: float = 2,
+            window_size: int = 50,
+            min_calls: int = 20,
+            open_sec: float = 10,
+            enabled: bool = True,
+    ):
+        self.name = name
+        self.is_failure = is_failure
+        self.failure_rate = failure_rate
+        self.slow_call_sec = slow_call_sec
+        self.min_calls = min_calls
+        self.open_sec = open_sec
+        self.enabled = enabled
+        self.state = CircuitState.CLOSED
+        self._calls: deque[bool] = deque(maxlen=window_size)  # True: failed or slow
+        self._opened_at = 0.0
+        self._trial_running = False
+        CIRCUIT_STATE.labels(name).set(self.state)
+
+    @property
+    def retry_after_sec(self) -> float:
+        """Time until the next trial call."""
+
+        return max(self._opened_at + self.open_sec - time.monotonic(), 0)
+
+    def _set_state(self, state: CircuitState) -> None:
+        if state != self.state:
+            logger.warning('Circuit "{}": {} -> {}'.format(self.name, self.state.name, state.name))
+            self.state = state
+            CIRCUIT_STATE.labels(self.name).set(state)
+
+    def _before_call(self) -> bool:
+        """Let the call through or raise 'CircuitOpenError'. Returns True for the trial call."""
+
+        if self.state == CircuitState.OPEN and self.retry_after_sec <= 0:
+            self._set_state(CircuitState.HALF_OPEN)
+        if self.state == CircuitState.CLOSED:
+            return False
+        if self.state == CircuitState.HALF_OPEN and not self._trial_running:
+            self._trial_running = True
+            return True
+        CIRCUIT_REJECTED.labels(self.name).inc()
+        raise CircuitOpenError(self.name, self.retry_after_sec)
+
+    def _after_call(self, failed: bool, trial: bool) -> None:
+        if trial:
+            self._trial_running = False
+            self._calls.clear()
+            if failed:
+                self._open()
+            else:
+                self._set_state(CircuitState.CLOSED)
+            return
+        self._calls.append(failed)
+        if (self.state == CircuitState.CLOSED and len(self._calls) >= self.min_calls
+                and sum(self._calls) / len(self._calls) >= self.failure_rate):
+            self._open()
+
+    def _open(self) -> None:
+        self._opened_at = time.monotonic()
+        self._calls.clear()
+        self._set_state(CircuitState.OPEN)
+
+    @contextlib.contextmanager
+    def guard(self) -> Iterator[None]:
+        """Wrap a call: 'with breaker.guard(): await call()'."""
+
+        if not self.enabled:
+            yield
+            return
+        trial = self._before_call()
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self._after_call(self.is_failure(e), trial)
+            raise
+        except BaseException:  # cancelled: the outcome is unknown
+            if trial:
+                self._trial_running = False
+            raise
+        self._after_call(time.monotonic() - start > self.slow_call_sec, trial)
@@ -0,0 +1,115 @@
+import asyncio
+import contextlib
+import logging
+import time
+from collections import deque
+from typing import AsyncIterator
+
+from core.config import app_settings
+from core.exeptions import ConcurrencyLimitError
+from core.metrics import LIMITER_IN_USE, LIMITER_QUEUE_DEPTH, LIMITER_QUEUE_TIME, LIMITER_REJECTED
+
+logger = logging.getLogger(__name__)
+
+
+class ConcurrencyLimiter:
+    """
+    Concurrency limit with a bounded wait queue (load shedding).
+    At most 'limit' calls hold a slot at a time, the others wait in FIFO order. A call is rejected
+    ('ConcurrencyLimitError') at once if the queue is full ('queue_size') or the expected wait
+    (the calls ahead served 'limit' at a time, each taking the average time) exceeds 'queue_timeout_sec',
+    and after 'queue_timeout_sec' of waiting otherwise: under overload the requests fail fast
+    instead of piling up behind the slow ones.
+    The limits are per worker.
+    """
+
+    # Weight of the last call in the average handling time
+    DURATION_SMOOTHING = 0.1
+
+    def __init__(self, name: str, limit: int, queue_size: int, queue_timeout_sec: float, enabled: bool = True):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout_sec = queue_timeout_sec
+        self.enabled = enabled
+        self._active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._avg_duration_sec = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def expected_wait_sec(self) -> float:
+        return (len(self._waiters) + 1) / max(self.limit, 1) * self._avg_duration_sec
+
+    def _reject(self, reason: str) -> None:
+        LIMITER_REJECTED.labels(self.name, reason).inc()
+        logger.debug('Limiter "{}": request rejected ({}), {} in queue'.format(self.name, reason, self.queue_depth))
+        raise ConcurrencyLimitError(self.name, self.expected_wait_sec())
+
+    async def _acquire(self) -> None:
+        if self._active < self.limit and not self._waiters:
+            self._active += 1
+            return
+        if len(self._waiters) >= self.queue_size:
+            self._reject('queue_full')
+        if self.expected_wait_sec() > self.queue_timeout_sec:
+            self._reject('budget')
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        LIMITER_QUEUE_DEPTH.labels(self.name).inc()
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout_sec)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                self._release()  # the slot has been handed over just before the timeout/cancellation
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject('timeout')
+            raise
+        finally:
+            with contextlib.suppress(ValueError):
+                self._waiters.remove(waiter)
+            LIMITER_QUEUE_DEPTH.labels(self.name).dec()
+            LIMITER_QUEUE_TIME.labels(self.name).observe(time.monotonic() - start)
+
+    def _release(self) -> None:
+        # The slot is handed over to the first waiter (so a newcomer can't take it out of turn)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    @contextlib.asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold a slot during a call: 'async with limiter.slot(): await call()'."""
+
+        if not self.enabled:
+            yield
+            return
+        await self._acquire()
+        LIMITER_IN_USE.labels(self.name).inc()
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            duration = time.monotonic() - start
+            self._avg_duration_sec += self.DURATION_SMOOTHING * (duration - self._avg_duration_sec)
+            LIMITER_IN_USE.labels(self.name).dec()
+            self._release()
+
+
+concurrency_limiters: dict[str, ConcurrencyLimiter] = {
+    name: ConcurrencyLimiter(
+        name,
+        limit=limit,
+        queue_size=app_settings.concurrency_queue_size,
+        queue_timeout_sec=app_settings.concurrency_queue_timeout_sec,
+        enabled=app_settings.concurrency_limits_enabled,
+    )
+    for name, limit in app_settings.concurrency_limits.items()
+}
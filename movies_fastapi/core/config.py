@@ -1,4 +1,5 @@
 import pathlib
+from typing import Literal
 
 from pydantic import RedisDsn
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -23,8 +24,52 @@ class AppSettings(BaseSettings):
     tag_films: str = 'Films'
     tag_genres: str = 'Genres'
     tag_persons: str = 'Persons'
+    tag_admin: str = 'Admin'
+
+    # Service endpoints (cache management): off by default; the requests must have the token
+    # in the 'X-Admin-Token' header (no request is accepted while the token is not set)
+    admin_api_enabled: bool = False
+    admin_api_token: str = ''
+
+    # Logging (see 'core.logger.setup_logging'): handlers behind a queue (written by a background thread)
+    # and the share of INFO/DEBUG records passed by the hot-path loggers
+    log_queue_enabled: bool = True
+    log_sample_rates: dict[str, float] = {'core.utils': 0.1, 'services.base_service': 0.1}
+
+    # 'Server-Timing' header (time of cache, es, validate, serialize) and the share of requests logged with it
+    server_timing_enabled: bool = True
+    server_timing_log_sample_rate: float = 0.01
+
+    # Concurrency limits per group of endpoints (see 'core.concurrency', per worker): at most '<limit>' requests
+    # of the group are handled at a time, at most 'concurrency_queue_size' wait for a slot;
+    # a request which would wait longer than 'concurrency_queue_timeout_sec' is rejected (503 with 'Retry-After')
+    concurrency_limits_enabled: bool = True
+    concurrency_limits: dict[str, int] = {'details': 64, 'list': 32, 'search': 8}
+    concurrency_queue_size: int = 100
+    concurrency_queue_timeout_sec: float = 1
+
+    # Production server: gunicorn with uvicorn workers (see 'gunicorn_conf.py')
+    server_bind_host: str = '0.0.0.0'
+    # Number of worker processes (0: the number of CPUs)
+    server_workers: int = 0
+    # Max number of connections waiting to be accepted (listen backlog)
+    server_backlog: int = 2048
+    # An idle keep-alive connection is closed after it
+    # (should be longer than the idle timeout of the proxy connections to the API)
+    server_keep_alive_sec: int = 5
+    # Time for a worker to finish the requests in flight on reload or stop
+    server_graceful_timeout_sec: int = 30
+    # A worker which doesn't respond for this time is killed and restarted
+    server_timeout_sec: int = 60
+    # Load the app in the master before forking the workers (faster start, less memory; a new code needs a restart)
+    server_preload: bool = False
+    # Restart a worker after this number of requests plus a random jitter (0: never)
+    server_max_requests: int = 0
+    server_max_requests_jitter: int = 0
 
     page_size: int = 20
+    # Max number of ids in one batch request
+    batch_max_size: int = 100
 
 
 class ESSettings(BaseSettings):
@@ -33,6 +78,32 @@ class ESSettings(BaseSettings):
     es_host: str = ...
     es_port: int = ...
     es_protocol: str = 'http'
+    # Nodes of a cluster, JSON: '["http://es1:9200", "http://es2:9200"]' (instead of 'es_host' and 'es_port')
+    es_hosts: list[str] = []
+
+    # Transport of the client (see README, "Профили клиента Elasticsearch").
+    # Connections are kept alive and reused: 'es_connections_per_node' is the pool size per node per worker
+    es_connections_per_node: int = 10
+    es_request_timeout_sec: float = 10
+    es_max_retries: int = 3
+    es_retry_on_timeout: bool = False
+    es_retry_on_status: list[int] = [429, 502, 503, 504]
+    # gzip of the requests and the responses: less traffic, more CPU
+    es_http_compress: bool = False
+    # Discover the nodes of the cluster: at start, after a node failure (not more often than the delay)
+    es_sniff_on_start: bool = False
+    es_sniff_on_node_failure: bool = False
+    es_sniff_timeout_sec: float = 1
+    es_min_delay_between_sniffing_sec: float = 60
+
+    # Circuit breaker (see 'core.circuit_breaker'): open when 'failure_rate' of the last 'window_size' calls
+    # (at least 'min_calls') have failed or taken longer than 'slow_call_sec', fail fast for 'open_sec'
+    es_circuit_breaker_enabled: bool = True
+    es_circuit_breaker_failure_rate: float = 0.5
+    es_circuit_breaker_slow_call_sec: float = 2
+    es_circuit_breaker_window_size: int = 50
+    es_circuit_breaker_min_calls: int = 20
+    es_circuit_breaker_open_sec: float = 10
 
     # tuple: (index_name, search_fields)
     es_index_names: dict[str, tuple] = {
@@ -45,11 +116,36 @@ class ESSettings(BaseSettings):
         'genres': {'index_name': 'genres', 'search_fields': ['name']},
         'persons': {'index_name': 'persons', 'search_fields': ['full_name']},
     }
+    # Hits are counted accurately up to this number (then the total is a lower bound), 'true' is not supported
+    es_track_total_hits: int = 10_000
+    # Cursor pagination ('search_after'): pin the walk to a point-in-time (opened by 'cursor=*')
+    es_cursor_pit_enabled: bool = False
+    es_cursor_pit_keep_alive: str = '1m'
+    # How often the index mappings (see 'services.mapping_registry') are reloaded
+    es_mapping_refresh_interval_sec: int = 5 * 60
 
     @property
     def es_url(self) -> str:
         return f'{self.es_protocol}://{self.es_host}:{self.es_port}'
 
+    @property
+    def es_client_options(self) -> dict:
+        """Arguments of 'AsyncElasticsearch'."""
+
+        return {
+            'hosts': self.es_hosts or [self.es_url],
+            'connections_per_node': self.es_connections_per_node,
+            'request_timeout': self.es_request_timeout_sec,
+            'max_retries': self.es_max_retries,
+            'retry_on_timeout': self.es_retry_on_timeout,
+            'retry_on_status': self.es_retry_on_status,
+            'http_compress': self.es_http_compress,
+            'sniff_on_start': self.es_sniff_on_start,
+            'sniff_on_node_failure': self.es_sniff_on_node_failure,
+            'sniff_timeout': self.es_sniff_timeout_sec,
+            'min_delay_between_sniffing': self.es_min_delay_between_sniffing_sec,
+        }
+
 
 class RedisSettings(BaseSettings):
     model_config = SettingsConfigDict(env_file=ENV_PATH, env_file_encoding='utf-8', extra='ignore')
@@ -57,12 +153,77 @@ class RedisSettings(BaseSettings):
     redis_host: str = ...
     redis_port: int = ...
     redis_cache_expiration_time_sec: int = 1 * 60
+    # How long (after 'redis_cache_expiration_time_sec') stale data may be served ('stale_while_revalidate' mode)
+    redis_cache_stale_time_sec: int = 10 * 60
+    # Fallback copy of each cached item, served while Elasticsearch is unavailable (0: no copies)
+    redis_cache_fallback_time_sec: int = 24 * 60 * 60
+    # Channel where the ETL publishes the written documents (see 'services.invalidation')
+    redis_invalidation_channel: str = 'movies_api:invalidation'
+    # Generation counter of the index: bumped by the ETL or the admin API, embedded in the cache keys
+    redis_generation_key: str = 'movies_api:generation:{index_name}'
 
     @property
     def redis_url(self) -> RedisDsn:
         return f'redis://{self.redis_host}:{self.redis_port}'
 
 
+class CacheSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_file=ENV_PATH, env_file_encoding='utf-8', extra='ignore')
+
+    # Cache keys: '<prefix>:v<version>:...'. Bump the version to invalidate the whole keyspace
+    cache_key_prefix: str = 'movies_api'
+    cache_key_version: int = 1
+
+    # In-process (L1) cache in front of Redis, one per worker
+    local_cache_enabled: bool = True
+    local_cache_max_size: int = 1024
+    local_cache_expiration_time_sec: int = 10
+
+    # Coalescing of concurrent cache misses for the same key: within a worker...
+    single_flight_enabled: bool = True
+    # ...and within the cluster (short lock in Redis, the other workers wait for the cache)
+    distributed_lock_enabled: bool = False
+    distributed_lock_timeout_sec: float = 5
+    distributed_lock_poll_interval_sec: float = 0.05
+
+    # Cache the final JSON body of the read endpoints: a hit is returned as is,
+    # without deserialization, model validation and serialization
+    response_cache_enabled: bool = False
+    # ETag for the read endpoints and 304 for a matching 'If-None-Match'
+    etag_enabled: bool = True
+
+    # Serve stale data after the soft TTL and refresh it in the background
+    stale_while_revalidate_enabled: bool = False
+    # Refresh in advance the keys read at least 'refresh_ahead_min_reads' times
+    # when less than 'refresh_ahead_window_sec' is left until the soft expiry
+    refresh_ahead_window_sec: int = 15
+    refresh_ahead_min_reads: int = 5
+
+    # Cache "not found" (unknown ids, empty searches) for a short time, so repeated 404s don't reach Elasticsearch
+    negative_cache_enabled: bool = True
+    negative_cache_expiration_time_sec: int = 10
+
+    # Compression of the payloads in Redis ('zstd' and 'lz4' need 'zstandard' and 'lz4' packages),
+    # the payloads smaller than 'cache_compression_min_size' bytes are stored as is
+    cache_compression_codec: Literal['none', 'zlib', 'zstd', 'lz4'] = 'none'
+    cache_compression_min_size: int = 1024
+
+    # Cache warm-up (at startup and after an ETL cycle): the genre list, 'warmup_film_pages' first pages of films
+    # (sorted by rating) and 'warmup_genre_film_pages' first pages of films of each genre (up to 'warmup_max_genres')
+    warmup_enabled: bool = True
+    warmup_film_pages: int = 3
+    warmup_genre_film_pages: int = 1
+    warmup_max_genres: int = 100
+    warmup_concurrency: int = 4
+    warmup_lock_timeout_sec: int = 60
+
+    # In-process snapshot of all genres (see 'services.genre_catalog'): the genre list is served from it
+    genre_catalog_enabled: bool = True
+    genre_catalog_max_size: int = 10_000
+    genre_catalog_refresh_interval_sec: int = 5 * 60
+
+
 app_settings = AppSettings()
 es_settings = ESSettings()
-redis_settings = RedisSettings()
\ No newline at end of file
+redis_settings = RedisSettings()
+cache_settings = CacheSettings()
\ No newline at end of file
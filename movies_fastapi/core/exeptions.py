@@ -1,2 +1,41 @@
 class ElasticsearchError(Exception):
     pass
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+class UnknownCodecError(ValueError):
+    """The payload is compressed by a codec that is not installed."""
+
+
+class ServiceUnavailableError(Exception):
+    """The request can't be handled now, it may be retried in 'retry_after_sec' (503 with 'Retry-After')."""
+
+    def __init__(self, message: str, name: str, retry_after_sec: float):
+        super().__init__(message)
+        self.name = name
+        self.retry_after_sec = retry_after_sec
+
+
+class CircuitOpenError(ServiceUnavailableError):
+    """The calls to the service are not made: its circuit breaker is open."""
+
+    def __init__(self, name: str, retry_after_sec: float):
+        super().__init__(f'Service "{name}" is temporarily unavailable', name, retry_after_sec)
+
+
+class ConcurrencyLimitError(ServiceUnavailableError):
+    """The request is shed: too many concurrent requests of the group."""
+
+    def __init__(self, name: str, retry_after_sec: float):
+        super().__init__(f'Too many "{name}" requests, try again later', name, retry_after_sec)
+
+
+class NotModified(Exception):
+    """The client already has the response ('If-None-Match' matches its ETag): 304 is returned."""
+
+    def __init__(self, etag: str):
+        super().__init__(etag)
+        self.etag = etag
@@ -1,3 +1,13 @@
+import atexit
+import logging
+import logging.config
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+
+from core.config import app_settings
+
 LOG_FORMAT = '[%(asctime)s][%(levelname)s][%(filename)s]<%(message)s>:line:%(lineno)d|func:%(funcName)s'
 LOG_DEFAULT_HANDLERS = ['console',]
 
@@ -55,3 +65,69 @@ LOGGING = {
         'handlers': LOG_DEFAULT_HANDLERS,
     },
 }
+
+
+class SamplingFilter(logging.Filter):
+    """Pass only a share ('rate') of the records below WARNING (the hot-path messages), all the others."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+class RecordQueueHandler(QueueHandler):
+    """
+    Put the record to the queue as is: it is formatted by the handlers behind the queue
+    (the default 'prepare' formats it here and drops 'args', which e.g. the uvicorn access formatter needs).
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+_listeners: list[QueueListener] = []
+_configured_pid: int | None = None
+
+
+def _stop_listeners() -> None:
+    """Flush the queued records (at exit)."""
+
+    while _listeners:
+        _listeners.pop().stop()
+
+
+def setup_logging() -> None:
+    """
+    Configure logging once per process (a forked worker configures it again).
+    With 'log_queue_enabled' the handlers of the configured loggers are moved behind a queue:
+    the request only puts the record into the queue, a background thread ('QueueListener') writes it.
+    The loggers from 'log_sample_rates' pass only a share of their INFO/DEBUG records.
+    """
+
+    global _configured_pid
+    if _configured_pid == os.getpid():
+        return
+    _listeners.clear()  # the threads of the parent process don't exist in a forked one
+    logging.config.dictConfig(LOGGING)
+
+    if app_settings.log_queue_enabled:
+        for name in dict.fromkeys(['', *LOGGING['loggers']]):
+            logger = logging.getLogger(name or None)
+            if not logger.handlers:
+                continue
+            log_queue = queue.SimpleQueue()
+            listener = QueueListener(log_queue, *logger.handlers, respect_handler_level=True)
+            logger.handlers = [RecordQueueHandler(log_queue)]
+            listener.start()
+            _listeners.append(listener)
+        if _configured_pid is None:
+            atexit.register(_stop_listeners)
+
+    for name, rate in app_settings.log_sample_rates.items():
+        logger = logging.getLogger(name)
+        logger.filters = [f for f in logger.filters if not isinstance(f, SamplingFilter)]
+        logger.addFilter(SamplingFilter(rate))
+    _configured_pid = os.getpid()
@@ -0,0 +1,130 @@
+import contextlib
+import functools
+import os
+import time
+from typing import Callable, Iterator
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+
+from core.timing import add_timing
+
+# Several workers (gunicorn): the metrics are written to 'PROMETHEUS_MULTIPROC_DIR' and merged on scrape
+MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+CODEC_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)
+
+CACHE_REQUESTS = Counter(
+    'movies_api_cache_requests_total',
+    'Cache lookups by level (local, redis) and result (hit, miss, stale, not_found)',
+    ['level', 'method', 'index', 'result'],
+)
+REDIS_DURATION = Histogram(
+    'movies_api_redis_duration_seconds', 'Redis call time', ['operation'], buckets=LATENCY_BUCKETS,
+)
+REDIS_ERRORS = Counter('movies_api_redis_errors_total', 'Failed Redis calls', ['operation'])
+CACHE_PAYLOAD_SIZE = Histogram(
+    'movies_api_cache_payload_bytes', 'Size of the cache payloads in Redis (as stored)', ['operation'],
+    buckets=SIZE_BUCKETS,
+)
+CACHE_COMPRESSION_BYTES = Counter(
+    'movies_api_cache_compression_bytes_total', 'Size of the compressed cache payloads: raw (before) and stored',
+    ['codec', 'kind'],
+)
+CACHE_COMPRESSION_DURATION = Histogram(
+    'movies_api_cache_compression_seconds', 'Compression time of the cache payloads (encode, decode)',
+    ['codec', 'operation'], buckets=CODEC_BUCKETS,
+)
+ES_DURATION = Histogram(
+    'movies_api_es_duration_seconds', 'Elasticsearch call time (wall, seen by the API)', ['method', 'index'],
+    buckets=LATENCY_BUCKETS,
+)
+ES_TOOK = Histogram(
+    'movies_api_es_took_seconds', "Elasticsearch search time ('took', server side)", ['method', 'index'],
+    buckets=LATENCY_BUCKETS,
+)
+ES_ERRORS = Counter('movies_api_es_errors_total', 'Failed Elasticsearch calls', ['method', 'index', 'error'])
+CIRCUIT_STATE = Gauge(
+    'movies_api_circuit_state', 'Circuit breaker state: 0 closed, 1 open, 2 half-open', ['name'],
+    multiprocess_mode='livemax',  # the state of a dead worker is dropped
+)
+CIRCUIT_REJECTED = Counter('movies_api_circuit_rejected_total', 'Calls rejected by an open circuit', ['name'])
+STALE_RESPONSES = Counter(
+    'movies_api_stale_responses_total', 'Data served from the fallback copy of the cache', ['method', 'index'],
+)
+LIMITER_IN_USE = Gauge(
+    'movies_api_limiter_in_use', 'Requests holding a slot of the concurrency limiter', ['name'],
+    multiprocess_mode='livesum',
+)
+LIMITER_QUEUE_DEPTH = Gauge(
+    'movies_api_limiter_queue_depth', 'Requests waiting for a slot of the concurrency limiter', ['name'],
+    multiprocess_mode='livesum',
+)
+LIMITER_QUEUE_TIME = Histogram(
+    'movies_api_limiter_queue_seconds', 'Time spent waiting for a slot of the concurrency limiter', ['name'],
+    buckets=LATENCY_BUCKETS,
+)
+LIMITER_REJECTED = Counter(
+    'movies_api_limiter_rejected_total', 'Requests rejected by the concurrency limiter (queue_full, budget, timeout)',
+    ['name', 'reason'],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'movies_api_requests_in_flight', 'Requests being handled', ['router'], multiprocess_mode='livesum',
+)
+REQUEST_DURATION = Histogram(
+    'movies_api_request_duration_seconds', 'Request handling time', ['router', 'status'], buckets=LATENCY_BUCKETS,
+)
+
+
+@contextlib.contextmanager
+def observe_redis(operation: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        REDIS_ERRORS.labels(operation).inc()
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        REDIS_DURATION.labels(operation).observe(duration)
+        add_timing('cache', duration)
+
+
+def timed_redis(func: Callable) -> Callable:
+    """Decorator for the Redis calls of the cache service: time and errors per method."""
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        with observe_redis(func.__name__):
+            return await func(*args, **kwargs)
+
+    return wrapper
+
+
+@contextlib.contextmanager
+def observe_es(method: str, index_name: str) -> Iterator[None]:
+    """Time of an Elasticsearch call; the errors are counted by type ('NotFoundError' of a missing document too)."""
+
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        ES_ERRORS.labels(method, index_name, type(e).__name__).inc()
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        ES_DURATION.labels(method, index_name).observe(duration)
+        add_timing('es', duration)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """The metrics in the Prometheus text format (of all the workers in the multiprocess mode)."""
+
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,111 @@
+import logging
+import random
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.circuit_breaker import STALE_RESPONSE_HEADER, start_response_flags
+from core.metrics import REQUEST_DURATION, REQUESTS_IN_FLIGHT
+from core.timing import format_server_timing, start_timings
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsMiddleware:
+    """
+    In-flight requests and handling time per router.
+    The router is found by the path prefix ('routers': prefix -> name; other paths are 'other'),
+    so unknown paths don't add labels.
+    """
+
+    def __init__(self, app: ASGIApp, routers: dict[str, str]):
+        self.app = app
+        # The longest prefix first
+        self.routers = sorted(routers.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def _router(self, path: str) -> str:
+        for prefix, name in self.routers:
+            if path.startswith(prefix):
+                return name
+        return 'other'
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        router = self._router(scope['path'])
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(router)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            REQUEST_DURATION.labels(router, str(status_code)).observe(time.perf_counter() - start)
+
+
+class ServerTimingMiddleware:
+    """
+    'Server-Timing' header: where the time of the request went ('cache', 'es', 'validate', 'serialize'
+    are collected by 'core.timing' during the request, 'total' is the whole handling before the response).
+    A sample of the requests ('log_sample_rate') is also logged with the timings.
+    """
+
+    def __init__(self, app: ASGIApp, log_sample_rate: float = 0):
+        self.app = app
+        self.log_sample_rate = log_sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        timings = start_timings()
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            if message['type'] == 'http.response.start':
+                timings['total'] = (time.perf_counter() - start) * 1000
+                headers = MutableHeaders(scope=message)
+                headers.append('Server-Timing', format_server_timing(timings))
+                if self.log_sample_rate and random.random() < self.log_sample_rate:
+                    logger.info('{} {} {}: {}'.format(
+                        scope['method'], scope['path'], message['status'], format_server_timing(timings)
+                    ))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class StaleResponseMiddleware:
+    """
+    'X-Stale-Response: true' header on the responses with stale data
+    (served from the fallback copy of the cache while Elasticsearch is unavailable, see 'core.circuit_breaker').
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        flags = start_response_flags()
+
+        async def send_wrapper(message: Message) -> None:
+            if message['type'] == 'http.response.start' and flags.get('stale'):
+                MutableHeaders(scope=message).append(STALE_RESPONSE_HEADER, 'true')
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,37 @@
+import contextlib
+import time
+from contextvars import ContextVar
+from typing import Iterator
+
+# Timings (ms) of the current request by stage ('cache', 'es', 'validate', 'serialize'),
+# set by 'ServerTimingMiddleware'; None outside a request
+_timings: ContextVar[dict[str, float] | None] = ContextVar('server_timings', default=None)
+
+
+def start_timings() -> dict[str, float]:
+    timings = {}
+    _timings.set(timings)
+    return timings
+
+
+def add_timing(name: str, duration_sec: float) -> None:
+    """Add the time of a stage to the current request (the calls of one stage are summed up)."""
+
+    timings = _timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0) + duration_sec * 1000
+
+
+@contextlib.contextmanager
+def timed(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_timing(name, time.perf_counter() - start)
+
+
+def format_server_timing(timings: dict[str, float]) -> str:
+    """'Server-Timing' header: 'cache;dur=0.4, es;dur=12.1'."""
+
+    return ', '.join('{};dur={:.1f}'.format(name, duration) for name, duration in timings.items())
@@ -1,31 +1,394 @@
+import asyncio
+import contextlib
 import functools
+import hashlib
+import inspect
 import logging
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Iterator
 
-from core.logger import LOGGING
+import orjson
+from pydantic import BaseModel
+
+from core.circuit_breaker import mark_stale_response
+from core.config import cache_settings
+from core.exeptions import CircuitOpenError, NotModified
+from core.metrics import CACHE_REQUESTS, STALE_RESPONSES
 
-logging.config.dictConfig(LOGGING)
 logger = logging.getLogger(__name__)
 
 
-def cache(func):
+class _NotFound:
+    """Sentinel of a negative cache entry: the item is known to be missing (falsy, like a miss)."""
+
+    def __bool__(self) -> bool:
+        return False
+
+    def __repr__(self) -> str:
+        return 'NOT_FOUND'
+
+
+NOT_FOUND = _NotFound()
+
+
+def _to_json(value: Any) -> Any:
+    """Serialization of the types that 'orjson' doesn't know (UUID, enum, datetime... it does)."""
+
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode='json', exclude_none=True)
+    raise TypeError
+
+
+def params_digest(params: dict[str, Any]) -> str:
+    """Compact digest of the normalized params (sorted keys, pydantic models without None fields)."""
+
+    payload = orjson.dumps(params, default=_to_json, option=orjson.OPT_SORT_KEYS)
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def entry_etag(payload: bytes) -> str:
+    """ETag of a cache entry: digest of its JSON (written to Redis with the entry)."""
+
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag: digest of the response body."""
+
+    return '"{}"'.format(hashlib.blake2b(body, digest_size=16).hexdigest())
+
+
+def etag_matches(if_none_match: str | None, etag: str | None) -> bool:
+    """Check the 'If-None-Match' header (a list of ETags, weak ones too, or '*')."""
+
+    if not if_none_match or not etag:
+        return False
+    candidates = {candidate.strip().removeprefix('W/') for candidate in if_none_match.split(',')}
+    return '*' in candidates or etag in candidates
+
+
+class ConditionalRequest:
     """
-    Decorator for cache.
-    If there is data in the cache, it takes it from there.
-    If not, it receives the data (the decorated function) and saves it to the cache.
+    The response ETag made of the ETags of the cache entries the response is built from,
+    so a matching 'If-None-Match' is answered as soon as the entries are known (see 'use_cache_entry').
     """
 
-    @functools.wraps(func)
-    async def wrapper(self, *args, **kwargs):
-        key = str(args) + '|' + str(kwargs)
-        if data := await self.cache_service.retrieve_from_cache(key=key):
-            logger.info('{}.{}: Retrieve data from cache'.format(type(self).__name__, func.__name__))
-            return data
+    def __init__(self, scope: str, if_none_match: str | None):
+        self.scope = scope  # the endpoint and its params
+        self.if_none_match = if_none_match
+        self.entry_etags: list[str] = []
+        self.complete = True  # an entry without ETag is used: the ETag is made from the body
+
+    @property
+    def etag(self) -> str | None:
+        if not (self.complete and self.entry_etags):
+            return None
+        return make_etag('\n'.join([self.scope, *self.entry_etags]).encode())
+
+
+# Set by 'response_cache' for the endpoint call; None outside it
+_conditional_request: ContextVar[ConditionalRequest | None] = ContextVar('conditional_request', default=None)
+
+
+@contextlib.contextmanager
+def conditional_request(scope: str, if_none_match: str | None) -> Iterator[ConditionalRequest]:
+    request = ConditionalRequest(scope, if_none_match)
+    token = _conditional_request.set(request)
+    try:
+        yield request
+    finally:
+        _conditional_request.reset(token)
+
+
+def use_cache_entry(etag: str | None) -> None:
+    """
+    Register a cache entry the response is built from.
+    'NotModified' is raised if the client already has the response: before the data is deserialized.
+    """
+
+    request = _conditional_request.get()
+    if request is None:
+        return
+    if etag is None:
+        request.complete = False
+        return
+    request.entry_etags.append(etag)
+    if etag_matches(request.if_none_match, request.etag):
+        raise NotModified(request.etag)
+
+
+async def refresh_periodically(load: Callable[[], Awaitable], interval_sec: float, name: str) -> None:
+    """Call 'load' every 'interval_sec' (to be run as a background task), a failure waits for the next time."""
+
+    while True:
+        await asyncio.sleep(interval_sec)
+        try:
+            await load()
+        except Exception:
+            logger.exception('Failed to refresh {}'.format(name))
+
+
+class IndexGenerations:
+    """
+    Generation counter per index, embedded in the cache keys of the index ('<index>:g<generation>').
+    The counters live in Redis and are bumped by the ETL or the admin API (see 'services.invalidation'):
+    a bump retires all the entries of the index at once, the old ones age out through TTL.
+    The workers keep the current values in memory, so building a key costs nothing.
+    A generation only grows: the bumps may be delivered out of order (the ETL and the admin API publish
+    from different connections), and going back would make the retired entries reachable again.
+    """
+
+    def __init__(self):
+        self._generations: dict[str, int] = {}
+
+    def get(self, index_name: str) -> int:
+        return self._generations.get(index_name, 0)
+
+    def set(self, index_name: str, generation: int) -> None:
+        """Move the index to the generation (a lower one than the current is ignored)."""
+
+        self._generations[index_name] = max(generation, self.get(index_name))
+
+    def to_dict(self) -> dict[str, int]:
+        return dict(self._generations)
+
+
+index_generations = IndexGenerations()
+
+
+def cache_key_builder(func: Callable, generational: bool = True) -> Callable[..., str]:
+    """
+    Get a function which makes a canonical cache key for a call of 'func':
+    '<prefix>:v<version>:<method>:<index>:g<generation>:<digest>' ('generational')
+    or '<prefix>:v<version>:<method>:<index>:<digest>'.
+    The params are bound to the signature (positional and keyword calls give the same key),
+    pydantic models are dumped without None fields, dict keys are sorted
+    and the result is hashed, so equivalent requests share an entry and the key stays short.
+    Bumping 'cache_key_version' retires the whole keyspace, bumping the generation retires one index
+    (old entries age out through TTL).
+    """
+
+    signature = inspect.signature(func)
+    prefix = '{}:v{}:{}'.format(cache_settings.cache_key_prefix, cache_settings.cache_key_version, func.__name__)
+
+    def make_key(self, *args, **kwargs) -> str:
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        params = dict(bound.arguments)
+        params.pop('self', None)
+        index_name = params.pop('index_name', None) or '-'
+        if generational:
+            return '{}:{}:g{}:{}'.format(prefix, index_name, index_generations.get(index_name), params_digest(params))
+        return '{}:{}:{}'.format(prefix, index_name, params_digest(params))
+
+    return make_key
+
+
+class SingleFlight:
+    """
+    Request coalescing: concurrent calls with the same key share one execution.
+    The first caller starts the task, the others wait for it and receive the same result.
+    The task is shielded, so a cancelled caller (e.g. client disconnect) doesn't cancel it for the rest.
+    """
+
+    def __init__(self):
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.create_task(func())
+            self._tasks[key] = task
+            task.add_done_callback(functools.partial(self._forget, key))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        self._tasks.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # mark as retrieved: the waiters (if any) have already got it
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+
+single_flight = SingleFlight()
+
+
+class ReadCounter:
+    """Number of reads per key since the last refresh (bounded: reset when 'max_keys' is exceeded)."""
+
+    def __init__(self, max_keys: int = 10_000):
+        self.max_keys = max_keys
+        self._reads: Counter[str] = Counter()
+
+    def add(self, key: str) -> int:
+        if len(self._reads) >= self.max_keys and key not in self._reads:
+            self._reads.clear()
+        self._reads[key] += 1
+        return self._reads[key]
+
+    def reset(self, key: str) -> None:
+        self._reads.pop(key, None)
+
+
+read_counter = ReadCounter()
+_background_tasks: set[asyncio.Task] = set()
+
+
+async def _load(
+        self, key: str, fallback_key: str, func: Callable, args: tuple, kwargs: dict, refresh: bool = False
+) -> Any:
+    """
+    Get the data (the decorated function) and save it to the cache (and its fallback copy under 'fallback_key').
+    With 'distributed_lock_enabled' only one worker in the cluster queries Elasticsearch for the key,
+    the others wait until the data (or "not found") appears in the cache, and go the usual way
+    (query, fallback copy or error) if the lock is held too long or released without saving.
+    A background refresh ('refresh') is just skipped if another worker is already loading the key.
+    """
+
+    lock = None
+    if cache_settings.distributed_lock_enabled:
+        lock = await self.cache_service.acquire_lock(key=key)
+        if lock is None:
+            if refresh:
+                return None
+            data = await self.cache_service.wait_for_cache(key=key)
+            if data or data is NOT_FOUND:
+                logger.info('{}.{}: Retrieve data from cache (after lock)'.format(type(self).__name__, func.__name__))
+                return data
+    try:
         if data := await func(self, *args, **kwargs):
             logger.info('{}.{}: Get data from Elasticsearch'.format(type(self).__name__, func.__name__))
-            await self.cache_service.add_to_cache(key=key, data=data)
+            await self.cache_service.add_to_cache(key=key, data=data, fallback_key=fallback_key)
             logger.info('{}.{}: Save data to cache'.format(type(self).__name__, func.__name__))
+        elif cache_settings.negative_cache_enabled:
+            await self.cache_service.add_not_found_to_cache(key=key)
+        return data
+    finally:
+        if lock is not None:
+            await self.cache_service.release_lock(lock)
+
+
+async def _add_to_local_cache(self, key: str, data: Any) -> str:
+    """Put the loaded data to the local cache with its ETag (the same as written to Redis), return the ETag."""
+
+    etag = entry_etag(orjson.dumps(data))
+    await self.local_cache_service.add_to_cache(key=key, data=data, etag=etag)
+    return etag
+
+
+async def _refresh(self, key: str, fallback_key: str, func: Callable, args: tuple, kwargs: dict) -> None:
+    """Reload the data in the background (stale-while-revalidate / refresh-ahead)."""
+
+    try:
+        data = await single_flight.do(
+            key, functools.partial(_load, self, key, fallback_key, func, args, kwargs, refresh=True)
+        )
+        if data:
+            await _add_to_local_cache(self, key, data)
+    except CircuitOpenError:
+        logger.info('{}.{}: Background refresh skipped: Elasticsearch is unavailable'.format(
+            type(self).__name__, func.__name__
+        ))
+    except Exception:
+        logger.exception('{}.{}: Background refresh failed'.format(type(self).__name__, func.__name__))
+
+
+def _schedule_refresh(self, key: str, fallback_key: str, func: Callable, args: tuple, kwargs: dict) -> None:
+    read_counter.reset(key)
+    task = asyncio.create_task(_refresh(self, key, fallback_key, func, args, kwargs))
+    _background_tasks.add(task)  # keep a reference until the task is done
+    task.add_done_callback(_background_tasks.discard)
+
+
+def cache(
+        func: Callable | None = None, *, generational: bool = True, skip: Callable[..., bool] | None = None
+):
+    """
+    Decorator for cache ('@cache', or '@cache(generational=False)' for the entries invalidated by document id).
+    The data is taken from the in-process cache (L1), then from Redis (L2), otherwise it is received
+    by the decorated function ('_load') and saved to both. The calls for which 'skip' is true are not cached.
+    """
+
+    if func is None:
+        return functools.partial(cache, generational=generational, skip=skip)
+
+    make_key = cache_key_builder(func, generational=generational)
+    # Without the generation: a new generation overwrites the same copy, so it survives index changes
+    make_fallback_key = cache_key_builder(func, generational=False) if generational else make_key
+
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        if skip is not None and skip(self, *args, **kwargs):
+            return await func(self, *args, **kwargs)
+        key = make_key(self, *args, **kwargs)
+        index_name = kwargs.get('index_name') or (args[0] if args else '-')
+        swr = cache_settings.stale_while_revalidate_enabled
+        if swr:
+            reads = read_counter.add(key)
+        if entry := await self.local_cache_service.retrieve_entry(key=key):
+            data, etag = entry
+            logger.debug('{}.{}: Retrieve data from local cache'.format(type(self).__name__, func.__name__))
+            CACHE_REQUESTS.labels('local', func.__name__, index_name, 'hit').inc()
+            use_cache_entry(etag)  # a conditional request gets 304 here
+            return data
+        if self.local_cache_service.enabled:
+            CACHE_REQUESTS.labels('local', func.__name__, index_name, 'miss').inc()
+
+        entry = await self.cache_service.retrieve_entry(key=key, with_freshness=swr)
+        if entry is not None and entry.not_found:
+            # "Not found" is cached for a short time, so repeated misses don't reach Elasticsearch
+            logger.info('{}.{}: Retrieve "not found" from cache'.format(type(self).__name__, func.__name__))
+            CACHE_REQUESTS.labels('redis', func.__name__, index_name, 'not_found').inc()
+            return None
+        if entry is not None:
+            # Stale data is returned at once and refreshed in the background,
+            # frequently read keys are refreshed shortly before their soft expiry (refresh-ahead)
+            stale = swr and entry.fresh_ttl <= 0
+            if stale:
+                logger.info('{}.{}: Retrieve stale data from cache'.format(type(self).__name__, func.__name__))
+                CACHE_REQUESTS.labels('redis', func.__name__, index_name, 'stale').inc()
+                _schedule_refresh(self, key, make_fallback_key(self, *args, **kwargs), func, args, kwargs)
+            else:
+                if (swr and entry.fresh_ttl < cache_settings.refresh_ahead_window_sec
+                        and reads >= cache_settings.refresh_ahead_min_reads):
+                    _schedule_refresh(self, key, make_fallback_key(self, *args, **kwargs), func, args, kwargs)
+                logger.info('{}.{}: Retrieve data from cache'.format(type(self).__name__, func.__name__))
+                CACHE_REQUESTS.labels('redis', func.__name__, index_name, 'hit').inc()
+            use_cache_entry(entry.etag)
+            if data := self.cache_service.load(entry):  # None if the item can't be decoded here
+                if not stale:
+                    await self.local_cache_service.add_to_cache(key=key, data=data, etag=entry.etag)
+                return data
+        CACHE_REQUESTS.labels('redis', func.__name__, index_name, 'miss').inc()
+
+        fallback_key = make_fallback_key(self, *args, **kwargs)
+        try:
+            if cache_settings.single_flight_enabled:  # one query to Elasticsearch per worker for concurrent misses
+                data = await single_flight.do(
+                    key, functools.partial(_load, self, key, fallback_key, func, args, kwargs)
+                )
+            else:
+                data = await _load(self, key, fallback_key, func, args, kwargs)
+        except CircuitOpenError:
+            # The fallback copy is marked as stale and not put to L1; without a copy the error is raised (503)
+            if not (entry := await self.cache_service.retrieve_fallback(key=fallback_key)):
+                raise
+            logger.warning('{}.{}: Elasticsearch is unavailable, retrieve data from fallback cache'.format(
+                type(self).__name__, func.__name__
+            ))
+            mark_stale_response()
+            STALE_RESPONSES.labels(func.__name__, index_name).inc()
+            use_cache_entry(entry.etag)
+            if not (data := self.cache_service.load(entry)):
+                raise
+            return data
+        if data:
+            use_cache_entry(await _add_to_local_cache(self, key, data))
             return data
         logger.warning('{}.{}: Item was not found in Elasticsearch'.format(type(self).__name__, func.__name__))
         return None
 
+    wrapper.make_key = make_key  # the same keys can be used for batch operations
     return wrapper
@@ -0,0 +1,40 @@
+"""
+Production server: gunicorn (process manager) with uvicorn workers.
+Run: 'gunicorn -c gunicorn_conf.py main:app' (the command line options override these ones).
+The settings are taken from 'AppSettings.server_*'.
+The uvicorn worker uses uvloop and httptools if they are installed (uvicorn[standard]), asyncio and h11 otherwise.
+Graceful reload: 'kill -HUP <master pid>' starts new workers (with the new code, unless the app is preloaded)
+and stops the old ones after their requests in flight (at most 'server_graceful_timeout_sec').
+"""
+import multiprocessing
+import os
+
+from prometheus_client import multiprocess
+
+from core.config import app_settings
+from core.logger import setup_logging
+
+bind = f'{app_settings.server_bind_host}:{app_settings.project_port}'
+workers = app_settings.server_workers or multiprocessing.cpu_count()
+worker_class = 'uvicorn.workers.UvicornWorker'
+backlog = app_settings.server_backlog
+keepalive = app_settings.server_keep_alive_sec
+graceful_timeout = app_settings.server_graceful_timeout_sec
+timeout = app_settings.server_timeout_sec
+preload_app = app_settings.server_preload
+max_requests = app_settings.server_max_requests
+max_requests_jitter = app_settings.server_max_requests_jitter
+# The heartbeat files of the workers in memory (a disk-backed /tmp in a container can stall them)
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+
+def post_fork(server, worker) -> None:
+    # A preloaded app has configured logging in the master: the queue threads are not inherited by the fork
+    setup_logging()
+
+
+def child_exit(server, worker) -> None:
+    # The metrics of a dead worker are merged no more (its counters stay, its live gauges are dropped)
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)
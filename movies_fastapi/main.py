@@ -1,19 +1,29 @@
+import asyncio
+import contextlib
 import logging
+import math
 from contextlib import asynccontextmanager
 
 import uvicorn
 from elasticsearch import AsyncElasticsearch
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
 from fastapi.responses import ORJSONResponse
 from redis.asyncio import Redis
 
-from api.v1 import base_api, film_api, person_api, genre_api
-from core.config import app_settings, redis_settings, es_settings
-from core.logger import LOGGING
+from api.v1 import admin_api, base_api, film_api, person_api, genre_api
+from core.config import app_settings, cache_settings, redis_settings, es_settings
+from core.exeptions import InvalidCursorError, ServiceUnavailableError
+from core.logger import setup_logging
+from core.middleware import MetricsMiddleware, ServerTimingMiddleware, StaleResponseMiddleware
+from core.utils import refresh_periodically
 from db import elastic
 from db import redis
+from services.genre_catalog import genre_catalog
+from services.invalidation import CacheInvalidator
+from services.mapping_registry import mapping_registry
+from services.warmup import CacheWarmer
 
-logging.config.dictConfig(LOGGING)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 
@@ -22,10 +32,32 @@ async def lifespan(app: FastAPI):
     # Startup
     redis.redis = Redis.from_url(redis_settings.redis_url)
     logger.info(f'redis conncection: %s', await redis.redis.ping())
-    elastic.es = AsyncElasticsearch(es_settings.es_url)
+    elastic.es = AsyncElasticsearch(**es_settings.es_client_options)
     logger.info(f'elasticsearch conncection: %s', await elastic.es.ping())
+    # Without Elasticsearch the API still starts (and serves the fallback copies of the cache),
+    # the mappings and the genre catalog are loaded on schedule
+    try:
+        await mapping_registry.load(elastic.es)
+        await genre_catalog.load(elastic.es)
+    except Exception:
+        logger.exception('Failed to load the index mappings and the genre catalog at startup')
+    mapping_refresh_task = asyncio.create_task(refresh_periodically(
+        lambda: mapping_registry.load(elastic.es), es_settings.es_mapping_refresh_interval_sec, 'index mappings'
+    ))
+    genre_catalog_refresh_task = asyncio.create_task(refresh_periodically(
+        lambda: genre_catalog.load(elastic.es), cache_settings.genre_catalog_refresh_interval_sec, 'genre catalog'
+    ))
+    cache_invalidator = CacheInvalidator(redis.redis, warmer=CacheWarmer(elastic.es, redis.redis))
+    await cache_invalidator.load_generations()
+    invalidation_task = asyncio.create_task(cache_invalidator.listen())
+    cache_invalidator.warm_up()
     yield
     # Finish (clean up and release the resources)
+    for task in (mapping_refresh_task, genre_catalog_refresh_task, invalidation_task):
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    await cache_invalidator.close()
     await redis.redis.close()
     await elastic.es.close()
 
@@ -44,12 +76,41 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+
+@app.exception_handler(InvalidCursorError)
+async def invalid_cursor_handler(request: Request, exc: InvalidCursorError) -> ORJSONResponse:
+    return ORJSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={'detail': str(exc)})
+
+
+@app.exception_handler(ServiceUnavailableError)
+async def service_unavailable_handler(request: Request, exc: ServiceUnavailableError) -> ORJSONResponse:
+    return ORJSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={'detail': str(exc)},
+        headers={'Retry-After': str(max(math.ceil(exc.retry_after_sec), 1))},
+    )
+
+
+app.add_middleware(StaleResponseMiddleware)
+if app_settings.server_timing_enabled:
+    app.add_middleware(ServerTimingMiddleware, log_sample_rate=app_settings.server_timing_log_sample_rate)
+app.add_middleware(MetricsMiddleware, routers={
+    app_settings.prefix + '/movies': app_settings.tag_films,
+    app_settings.prefix + '/persons': app_settings.tag_persons,
+    app_settings.prefix + '/genres': app_settings.tag_genres,
+    app_settings.prefix + '/admin': app_settings.tag_admin,
+})
+
 app.include_router(base_api.router, tags=[app_settings.tag_service])
 app.include_router(film_api.router, prefix=app_settings.prefix + '/movies', tags=[app_settings.tag_films])
 app.include_router(person_api.router, prefix=app_settings.prefix + '/persons', tags=[app_settings.tag_persons])
 app.include_router(genre_api.router, prefix=app_settings.prefix + '/genres', tags=[app_settings.tag_genres])
+if app_settings.admin_api_enabled:
+    app.include_router(admin_api.router, prefix=app_settings.prefix + '/admin', tags=[app_settings.tag_admin])
 
 if __name__ == '__main__':
+    # Development server (one process, restarted on code changes).
+    # Production: 'gunicorn -c gunicorn_conf.py main:app' (see 'gunicorn_conf.py')
     uvicorn.run(
         'main:app',
         host=app_settings.project_host,
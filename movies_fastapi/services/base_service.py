@@ -1,19 +1,32 @@
-import logging.config
+import asyncio
+import base64
+import binascii
+import functools
+import logging
+import time
 from abc import ABC, abstractmethod
-from typing import Any, TypeVar, Generic
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, TypeVar, Generic, TypedDict
 from uuid import UUID
 
 import orjson
-from elasticsearch import AsyncElasticsearch
-from elasticsearch_dsl import Q, AsyncSearch, Index
+from elasticsearch import ApiError, AsyncElasticsearch, NotFoundError, TransportError
+from elasticsearch_dsl import Q, AsyncSearch
 from pydantic import BaseModel
 from redis.asyncio import Redis
+from redis.asyncio.lock import Lock
+from redis.exceptions import LockError
+
+from core.circuit_breaker import CircuitBreaker, mark_stale_response
+from core.config import redis_settings, es_settings, cache_settings
+from core.exeptions import CircuitOpenError, InvalidCursorError, UnknownCodecError
+from core.metrics import CACHE_PAYLOAD_SIZE, ES_TOOK, STALE_RESPONSES, observe_es, timed_redis
+from core.utils import NOT_FOUND, cache, entry_etag
+from services.cache_codec import payload_codec
+from services.genre_catalog import genre_catalog
+from services.mapping_registry import mapping_registry
 
-from core.config import redis_settings, es_settings
-from core.logger import LOGGING
-from core.utils import cache
-
-logging.config.dictConfig(LOGGING)
 logger = logging.getLogger(__name__)
 
 
@@ -36,41 +49,173 @@ GetSchemaType = TypeVar("GetSchemaType", bound=BaseModel)
 QueryParamsSchemaType = TypeVar("QueryParamsSchemaType", bound=BaseModel)
 
 
+CURSOR_START = '*'
+
+
+@functools.cache
+def source_fields(model: type[BaseModel]) -> tuple[str, ...]:
+    """
+    Document fields needed to build the model (for '_source' includes).
+    So Elasticsearch, the network, the cache and the validation only handle the fields that are returned.
+    Nested objects are taken whole: dotted includes would drop empty arrays (e.g. a film without genres).
+    """
+
+    return tuple(model.model_fields)
+
+
+class SearchResult(TypedDict):
+    """
+    Page of documents and the total number of hits (a lower bound if 'total_relation' is 'gte').
+    'next_cursor' is set for a full page in the cursor mode, unless it is known to be the last one.
+    """
+    total: int
+    total_relation: str
+    items: list[dict[str, Any]]
+    next_cursor: str | None
+
+
+def encode_cursor(search_after: list, pit_id: str | None = None, seen: int = 0) -> str:
+    """Opaque cursor: the sort values of the last hit (and the point-in-time id, the number of hits before it)."""
+
+    return base64.urlsafe_b64encode(
+        orjson.dumps({'search_after': search_after, 'pit_id': pit_id, 'seen': seen})
+    ).decode()
+
+
+def decode_cursor(cursor: str) -> dict[str, Any]:
+    try:
+        data = orjson.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if (not isinstance(data, dict) or not isinstance(data.get('search_after'), list)
+                or not isinstance(data.get('seen', 0), int)):
+            raise ValueError
+    except (ValueError, binascii.Error):
+        raise InvalidCursorError('Invalid cursor')
+    return data
+
+
+def opens_point_in_time(
+        self, index_name: str, query_params: BaseModel, source_includes: list[str] | None = None
+) -> bool:
+    """
+    The first page of a cursor walk ('cursor=*') in the point-in-time mode: not cached,
+    every walk gets its own point-in-time (it is closed at the end of the walk).
+    """
+
+    return es_settings.es_cursor_pit_enabled and getattr(query_params, 'cursor', None) == CURSOR_START
+
+
+def is_es_failure(error: Exception) -> bool:
+    """Elasticsearch is failing: no connection, timeout, overload or a server error (not e.g. a missing document)."""
+
+    if isinstance(error, ApiError):
+        return error.meta.status >= 500 or error.meta.status == 429
+    return isinstance(error, (TransportError, asyncio.TimeoutError))
+
+
+es_circuit_breaker = CircuitBreaker(
+    'elasticsearch',
+    is_failure=is_es_failure,
+    failure_rate=es_settings.es_circuit_breaker_failure_rate,
+    slow_call_sec=es_settings.es_circuit_breaker_slow_call_sec,
+    window_size=es_settings.es_circuit_breaker_window_size,
+    min_calls=es_settings.es_circuit_breaker_min_calls,
+    open_sec=es_settings.es_circuit_breaker_open_sec,
+    enabled=es_settings.es_circuit_breaker_enabled,
+)
+
+
 class ElasticsearchDBService(DBService, Generic[GetSchemaType]):
     def __init__(self, es_client: AsyncElasticsearch, redis: Redis):
         self.es_client = es_client
         self.cache_service = RedisCacheService(redis)   # Used in the 'cache' decorator
+        self.local_cache_service = local_cache_service  # L1 in front of 'cache_service' (per worker)
 
-    @cache
-    async def get_by_id(self, index_name: str, doc_id: UUID) -> dict[str, Any] | None:
+    @cache(generational=False)
+    async def get_by_id(
+            self, index_name: str, doc_id: UUID, source_includes: list[str] | None = None
+    ) -> dict[str, Any] | None:
+        """
+        Get item by id: realtime document GET (the ETL indexes documents with '_id' = uuid),
+        without query parsing, scoring and the search thread pool.
+        """
 
         try:
-            s = AsyncSearch(using=self.es_client, index=index_name)
-            s = s.filter('term', uuid=str(doc_id))
-            response = await s.execute()
-            doc = response.hits.hits[0]['_source'].to_dict()
-            return doc
-        except IndexError:
+            with es_circuit_breaker.guard(), observe_es('get_by_id', index_name):
+                response = await self.es_client.get(index=index_name, id=str(doc_id), source_includes=source_includes)
+            return response['_source']
+        except NotFoundError:
             return None
         except Exception as e:
             print(f'Error in get: {e}')
             raise e
 
+    async def get_by_ids(self, index_name: str, doc_ids: list[UUID]) -> list[dict[str, Any]]:
+        """
+        Get items by ids (in the same order, not found ones are skipped).
+        The entries are shared with 'get_by_id': the cache is read in one MGET,
+        the misses are fetched by one 'mget' request to Elasticsearch and written back in one pipeline.
+        While the Elasticsearch circuit is open, the misses are taken from the fallback copies of the cache.
+        """
+
+        doc_ids = list(dict.fromkeys(doc_ids))  # without duplicates, in the same order
+        keys = [self.get_by_id.make_key(self, index_name, doc_id) for doc_id in doc_ids]
+        docs = {key: await self.local_cache_service.retrieve_from_cache(key=key) for key in keys}
+
+        l2_keys = [key for key, doc in docs.items() if not doc]
+        if l2_keys:
+            docs.update(zip(l2_keys, await self.cache_service.retrieve_many_from_cache(keys=l2_keys)))
+        # Known to be missing ("not found" cached) are not requested again
+        missing = {key: doc_id for key, doc_id in zip(keys, doc_ids) if not docs[key] and docs[key] is not NOT_FOUND}
+        logger.info('{} of {} documents retrieved from cache'.format(len(keys) - len(missing), len(keys)))
+
+        if missing:
+            try:
+                with es_circuit_breaker.guard(), observe_es('get_by_ids', index_name):
+                    response = await self.es_client.mget(
+                        index=index_name, ids=[str(doc_id) for doc_id in missing.values()]
+                    )
+            except CircuitOpenError:
+                fallback = await self.cache_service.retrieve_many_fallback(keys=list(missing))
+                if not any(fallback):
+                    raise
+                logger.warning('Elasticsearch is unavailable, {} of {} documents retrieved from fallback cache'.format(
+                    sum(1 for doc in fallback if doc), len(missing)
+                ))
+                mark_stale_response()
+                STALE_RESPONSES.labels('get_by_ids', index_name).inc()
+                docs.update(zip(missing, fallback))
+                return [docs[key] for key in keys if docs[key]]
+            found = {
+                key: doc['_source'] for key, doc in zip(missing, response['docs']) if doc.get('found')
+            }
+            logger.info('{} of {} documents found in Elasticsearch'.format(len(found), len(missing)))
+            not_found = [key for key in missing if key not in found] if cache_settings.negative_cache_enabled else []
+            if found or not_found:
+                await self.cache_service.add_many_to_cache(items=found, not_found=not_found)
+            docs.update(found)
+
+        # Only the documents taken from Redis or Elasticsearch are written to the local cache (L1 hits are not)
+        for key in l2_keys:
+            if docs[key]:
+                await self.local_cache_service.add_to_cache(
+                    key=key, data=docs[key], etag=entry_etag(orjson.dumps(docs[key]))
+                )
+        return [docs[key] for key in keys if docs[key]]
+
     @cache
-    async def get_exact_match(self, index_name: str, obj_in: GetSchemaType) -> list[dict[str, Any]] | None:
+    async def get_exact_match(
+            self, index_name: str, obj_in: GetSchemaType, source_includes: list[str] | None = None
+    ) -> SearchResult | None:
         """Get item by fields - exact match."""
 
         proper_obj_in = await self._transform_fields(index_name, obj_in)
         try:
             s = AsyncSearch(using=self.es_client, index=index_name)
+            if source_includes:
+                s = s.source(includes=source_includes)
             for field, value in proper_obj_in.items():
                 s = s.filter('term', **{field: value})
-            total_found = await s.count()  # For informational purposes only
-            logger.info('{} documents found'.format(total_found))
-
-            docs = [hit.to_dict() async for hit in s]
-            logger.info('{} documents to response'.format(len(docs)))
-            return docs
+            return await self._search(s, 'get_exact_match', index_name)
         except IndexError:
             return None
         except Exception as e:
@@ -81,29 +226,21 @@ class ElasticsearchDBService(DBService, Generic[GetSchemaType]):
         """Transform fields that can have an exact search in their raw form"""
         # For the 'title' field: it is additionally possible to search for an exact match
         # (but field name must be different: 'title.raw')
+        # The field names are resolved by the mapping registry (in memory, without a request to Elasticsearch)
 
         proper_data = data.model_dump(exclude_none=True)
-        field_names = list(proper_data.keys())
-
-        # get mapping from index
-        indx = Index(index_name, using=self.es_client)
-        mapping = await indx.get_mapping()
-        field_mapping = mapping[index_name]['mappings']['properties']
-        raw_pattern = {'raw': {'type': 'keyword'}}
-
-        # change name of field (adding ".raw" if field has "keyword") for search purposes
-        for field in field_names:
-            fm_field = field_mapping[field]
-            match fm_field:
-                case {'type': 'text', 'fields': raw_pattern}:
-                    proper_data[f'{field}.raw'] = proper_data.pop(field)
-        return proper_data
+        exact_fields = await mapping_registry.get_exact_fields(self.es_client, index_name)
+        return {exact_fields.get(field, field): value for field, value in proper_data.items()}
 
-    @cache
-    async def get_list(self, index_name: str, query_params: QueryParamsSchemaType) -> list[dict]:
-        """Get list of items by search."""
+    @cache(skip=opens_point_in_time)
+    async def get_list(
+            self, index_name: str, query_params: QueryParamsSchemaType, source_includes: list[str] | None = None
+    ) -> SearchResult | None:
+        """Get list of items by search ('source_includes': only these fields of the documents are fetched)."""
 
         s = AsyncSearch(using=self.es_client, index=index_name)
+        if source_includes:
+            s = s.source(includes=source_includes)
 
         if 'query' in query_params.model_fields:
             search_params = {es_settings.es_indexes[index_name]['search_fields'][0]: query_params.query}
@@ -111,26 +248,119 @@ class ElasticsearchDBService(DBService, Generic[GetSchemaType]):
             s = s.query(query)
 
         # s = s.sort('_score') # sort by relevance (by default, it seems like it should be)
+        sort = []
         if 'sort' in query_params.model_fields and query_params.sort is not None:
+            sort.append(query_params.sort)
             s = s.sort(query_params.sort)
 
         if 'genre_name' in query_params.model_fields and query_params.genre_name is not None:
             # filter_query = Q('terms', genres=query_params.genre)
-            filter_query = Q('nested', path='genres', query=Q('match', genres__name=query_params.genre_name))
+            # A known genre is filtered by the exact uuid (no text analysis), an unknown one by the name
+            if genre_uuid := genre_catalog.get_uuid(query_params.genre_name):
+                filter_query = Q('nested', path='genres', query=Q('term', genres__uuid=str(genre_uuid)))
+            else:
+                filter_query = Q('nested', path='genres', query=Q('match', genres__name=query_params.genre_name))
 
             s = s.filter(filter_query)  # equivalent: "s = s.query(filter_query)"
 
+        if 'cursor' in query_params.model_fields:
+            return await self._search_after(s, index_name, query_params, sort)
+
         from_item = (query_params.page_number - 1) * query_params.page_size
         s = s[from_item:query_params.page_number * query_params.page_size]
         # s = s[from_=from_item, size=query_params.page_size]
 
-        total_found = await s.count()  # For informational purposes only
-        logger.info('{} documents found'.format(total_found))
+        return await self._search(s, 'get_list', index_name)
+
+    async def _search_after(
+            self, s: AsyncSearch, index_name: str, query_params: QueryParamsSchemaType, sort: list[str]
+    ) -> SearchResult | None:
+        """
+        Cursor pagination: the page goes after the sort values of the previous page's last hit
+        ('search_after'), so its cost doesn't depend on the depth (and 'max_result_window' is not a limit).
+        The sort is made stable by the 'uuid' tiebreaker.
+        Without a cursor the usual 'page_number' is used, but a full page also gets 'next_cursor'.
+        The point-in-time is closed when the walk ends (the last page), otherwise it expires by 'keep_alive'.
+        """
+
+        sort_fields = [*(sort or ['_score']), 'uuid']
+        s = s.sort(*sort_fields)
+        pit_id = None
+        seen = 0
+        if query_params.cursor is None:
+            seen = (query_params.page_number - 1) * query_params.page_size
+            s = s[seen:query_params.page_number * query_params.page_size]
+        else:
+            s = s[:query_params.page_size]
+            if query_params.cursor == CURSOR_START:
+                if es_settings.es_cursor_pit_enabled:
+                    with es_circuit_breaker.guard(), observe_es('open_point_in_time', index_name):
+                        pit = await self.es_client.open_point_in_time(
+                            index=index_name, keep_alive=es_settings.es_cursor_pit_keep_alive
+                        )
+                    pit_id = pit['id']
+            else:
+                cursor = decode_cursor(query_params.cursor)
+                s = s.extra(search_after=cursor['search_after'])
+                pit_id = cursor.get('pit_id')
+                seen = cursor.get('seen', 0)
+
+        if pit_id is not None:
+            try:
+                # With a point-in-time the index is taken from it
+                pit = {'id': pit_id, 'keep_alive': es_settings.es_cursor_pit_keep_alive}
+                return await self._search(
+                    s.index().extra(pit=pit), 'get_list', index_name, with_cursor=True, seen=seen
+                )
+            except NotFoundError:
+                logger.warning('Point-in-time has expired, continue without it')
+                # A search with a point-in-time adds the '_shard_doc' tiebreaker to the sort values
+                if search_after := s.to_dict().get('search_after'):
+                    s = s.extra(search_after=search_after[:len(sort_fields)])
+        return await self._search(s, 'get_list', index_name, with_cursor=True, seen=seen)
+
+    async def _close_point_in_time(self, index_name: str, pit_id: str) -> None:
+        """Release the point-in-time of a finished walk (best effort: otherwise it expires by 'keep_alive')."""
 
-        docs = [hit.to_dict() async for hit in s]
-        logger.info('{} documents to response'.format(len(docs)))
+        try:
+            with observe_es('close_point_in_time', index_name):
+                await self.es_client.close_point_in_time(id=pit_id)
+        except Exception as e:
+            logger.warning('Point-in-time was not closed: {}'.format(e))
+
+    async def _search(
+            self, s: AsyncSearch, method: str = 'search', index_name: str = '-',
+            with_cursor: bool = False, seen: int = 0
+    ) -> SearchResult | None:
+        """
+        Execute the search. The total number of hits is counted in the same request
+        (up to 'es_track_total_hits'), so there is no separate 'count' request.
+        'method' and 'index_name' label the metrics (the wall time and the 'took' of Elasticsearch).
+        With 'with_cursor' a full page gets 'next_cursor' unless the exact total ('seen' hits before the page
+        and the page itself) shows it is the last one.
+        """
+
+        s = s.extra(track_total_hits=es_settings.es_track_total_hits)
+        with es_circuit_breaker.guard(), observe_es(method, index_name):
+            response = await s.execute()
+        ES_TOOK.labels(method, index_name).observe(response.took / 1000)
+        total = response.hits.total
+        logger.info('{} documents found'.format(total.value))
 
-        return docs
+        docs = [hit.to_dict() for hit in response]
+        logger.info('{} documents to response'.format(len(docs)))
+        pit_id = response.to_dict().get('pit_id')  # may change between the requests, the latest one is used
+
+        next_cursor = None
+        seen += len(docs)
+        if (with_cursor and docs and len(docs) == s.to_dict().get('size', 10)
+                and not (total.relation == 'eq' and seen >= total.value)):
+            next_cursor = encode_cursor(list(response.hits[-1].meta.sort), pit_id, seen)
+        elif pit_id is not None:
+            await self._close_point_in_time(index_name, pit_id)
+        if not docs:
+            return None
+        return SearchResult(total=total.value, total_relation=total.relation, items=docs, next_cursor=next_cursor)
 
 
 class CacheService(ABC):
@@ -144,23 +374,290 @@ class CacheService(ABC):
         raise NotImplementedError
 
 
+@dataclass
+class CacheEntry:
+    """Item read from Redis as stored: its ETag is known before the data is deserialized ('RedisCacheService.load')."""
+
+    value: bytes
+    fresh_ttl: float = 0  # time (sec) left until the soft expiry, negative if the item is stale
+
+    @property
+    def not_found(self) -> bool:
+        return self.value == RedisCacheService.NOT_FOUND_VALUE
+
+    @property
+    def etag(self) -> str | None:
+        return RedisCacheService.etag_of(self.value)
+
+
 class RedisCacheService(CacheService):
+    """Cache in Redis (L2): the items, the negative entries ("not found") and the fallback copies of the items."""
+
+    NOT_FOUND_VALUE = b'\x00not_found'  # not a JSON, read as 'NOT_FOUND'
+    ETAG_HEADER = b'\x00etag:'  # an item is stored as '<ETAG_HEADER><ETag of the JSON><payload>'
+    ETAG_SIZE = 32
+
     def __init__(self, redis_client: Redis):
         self.redis_client = redis_client
         self.expiration_time_sec = redis_settings.redis_cache_expiration_time_sec
+        # 'stale_while_revalidate': an item lives 'expiration_time_sec' (soft TTL) plus 'stale_time_sec',
+        # the soft expiry is derived from the remaining TTL, so the stored value is the same in both modes
+        self.stale_time_sec = (redis_settings.redis_cache_stale_time_sec
+                               if cache_settings.stale_while_revalidate_enabled else 0)
+        self.not_found_expiration_time_sec = cache_settings.negative_cache_expiration_time_sec
+        self.fallback_time_sec = redis_settings.redis_cache_fallback_time_sec
+        self.codec = payload_codec  # large payloads are compressed
+
+    @staticmethod
+    def fallback_copy_key(key: str) -> str:
+        """
+        Key of the fallback copy of an item: it lives 'fallback_time_sec'
+        and is served only while Elasticsearch is unavailable (see 'es_circuit_breaker').
+        """
+
+        return f'fallback:{key}'
+
+    @classmethod
+    def etag_of(cls, value: bytes | None) -> str | None:
+        """ETag written with a stored item (None for a negative entry or an item written without it)."""
+
+        if not value or not value.startswith(cls.ETAG_HEADER):
+            return None
+        return value[len(cls.ETAG_HEADER):len(cls.ETAG_HEADER) + cls.ETAG_SIZE].decode()
+
+    def _dumps(self, data: Any) -> bytes:
+        payload = orjson.dumps(data)
+        value = self.ETAG_HEADER + entry_etag(payload).encode() + self.codec.encode(payload)
+        CACHE_PAYLOAD_SIZE.labels('write').observe(len(value))
+        return value
+
+    def _loads(self, value: bytes | None) -> Any:
+        if not value:
+            return None
+        if value == self.NOT_FOUND_VALUE:
+            return NOT_FOUND
+        CACHE_PAYLOAD_SIZE.labels('read').observe(len(value))
+        if value.startswith(self.ETAG_HEADER):
+            value = value[len(self.ETAG_HEADER) + self.ETAG_SIZE:]
+        try:
+            return orjson.loads(self.codec.decode(value))
+        except UnknownCodecError as e:  # a miss: the item is loaded again
+            logger.warning('{}, the item is ignored'.format(e))
+            return None
+
+    def load(self, entry: CacheEntry) -> Any:
+        """Deserialize an item read by 'retrieve_entry' ('NOT_FOUND' for a negative entry)."""
+
+        return self._loads(entry.value)
 
-    async def add_to_cache(self, key: str, data: dict | list[dict]) -> None:
-        """Put data to cache."""
+    @timed_redis
+    async def add_to_cache(self, key: str, data: dict | list[dict], fallback_key: str | None = None) -> None:
+        """Put data to cache (and its fallback copy, under 'fallback_key' if the item key is not stable)."""
 
-        value = orjson.dumps(data)
-        await self.redis_client.set(
-            name=key,
-            value=value,
-            ex=self.expiration_time_sec
-        )
+        value = self._dumps(data)
+        if not self.fallback_time_sec:
+            await self.redis_client.set(name=key, value=value, ex=self.expiration_time_sec + self.stale_time_sec)
+            return
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.set(name=key, value=value, ex=self.expiration_time_sec + self.stale_time_sec)
+            pipe.set(name=self.fallback_copy_key(fallback_key or key), value=value, ex=self.fallback_time_sec)
+            await pipe.execute()
 
+    @timed_redis
+    async def add_not_found_to_cache(self, key: str) -> None:
+        """Remember that there is no data for the key (for a short time)."""
+
+        await self.redis_client.set(name=key, value=self.NOT_FOUND_VALUE, ex=self.not_found_expiration_time_sec)
+
+    @timed_redis
     async def retrieve_from_cache(self, key: str) -> list[dict] | None:
+        """Get data from cache ('NOT_FOUND' for a negative entry)."""
+
+        return self._loads(await self.redis_client.get(key))
+
+    @timed_redis
+    async def add_raw_to_cache(self, key: str, value: bytes) -> None:
+        """Put already serialized data to cache."""
+
+        value = self.codec.encode(value)
+        CACHE_PAYLOAD_SIZE.labels('write').observe(len(value))
+        await self.redis_client.set(name=key, value=value, ex=self.expiration_time_sec)
+
+    @timed_redis
+    async def retrieve_raw_from_cache(self, key: str) -> bytes | None:
+        """Get data from cache as is (without deserialization)."""
+
+        value = await self.redis_client.get(key)
+        if not value:
+            return None
+        CACHE_PAYLOAD_SIZE.labels('read').observe(len(value))
+        try:
+            return self.codec.decode(value)
+        except UnknownCodecError as e:
+            logger.warning('{}, the item is ignored'.format(e))
+            return None
+
+    @timed_redis
+    async def add_many_to_cache(self, items: dict[str, dict | list[dict]], not_found: list[str] = ()) -> None:
+        """Put several items (and negative entries for the 'not_found' keys) to cache (in one round trip)."""
+
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for key, data in items.items():
+                value = self._dumps(data)
+                pipe.set(name=key, value=value, ex=self.expiration_time_sec + self.stale_time_sec)
+                if self.fallback_time_sec:
+                    pipe.set(name=self.fallback_copy_key(key), value=value, ex=self.fallback_time_sec)
+            for key in not_found:
+                pipe.set(name=key, value=self.NOT_FOUND_VALUE, ex=self.not_found_expiration_time_sec)
+            await pipe.execute()
+
+    @timed_redis
+    async def retrieve_many_from_cache(self, keys: list[str]) -> list[dict | list[dict] | None]:
+        """Get several items from cache (in one MGET), None for the missing ones."""
+
+        values = await self.redis_client.mget(keys)
+        return [self._loads(value) for value in values]
+
+    @timed_redis
+    async def retrieve_fallback(self, key: str) -> CacheEntry | None:
+        """Get the fallback copy of the item as stored (stale, for the time Elasticsearch is unavailable)."""
+
+        value = await self.redis_client.get(self.fallback_copy_key(key))
+        return CacheEntry(value) if value else None
+
+    @timed_redis
+    async def retrieve_many_fallback(self, keys: list[str]) -> list[dict | list[dict] | None]:
+        """Get the fallback copies of several items (in one MGET), None for the missing ones."""
+
+        values = await self.redis_client.mget([self.fallback_copy_key(key) for key in keys])
+        return [self._loads(value) for value in values]
+
+    @timed_redis
+    async def retrieve_entry(self, key: str, with_freshness: bool = False) -> CacheEntry | None:
+        """
+        Get an item from cache as stored (see 'load') and, 'with_freshness',
+        the time left until its soft expiry in the same round trip.
+        """
+
+        if not with_freshness:
+            value = await self.redis_client.get(key)
+            return CacheEntry(value) if value else None
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            value, ttl_ms = await pipe.get(key).pttl(key).execute()
+        return CacheEntry(value, ttl_ms / 1000 - self.stale_time_sec) if value else None
+
+    @timed_redis
+    async def acquire_lock(self, key: str) -> Lock | None:
+        """Try to take the lock for loading data by key (without waiting)."""
+
+        lock = self.redis_client.lock(f'lock:{key}', timeout=cache_settings.distributed_lock_timeout_sec)
+        return lock if await lock.acquire(blocking=False) else None
+
+    @timed_redis
+    async def release_lock(self, lock: Lock) -> None:
+        try:
+            await lock.release()
+        except LockError:
+            logger.warning('Lock "{}" has already expired'.format(lock.name))
+
+    async def wait_for_cache(self, key: str) -> list[dict] | None:
+        """
+        Wait for data by key while another worker holds the lock.
+        'NOT_FOUND' if the holder has cached "not found", None if the lock has not been released in time
+        or the holder has finished without saving (e.g. Elasticsearch has failed): the caller goes the usual way.
+        """
+
+        deadline = time.monotonic() + cache_settings.distributed_lock_timeout_sec
+        while time.monotonic() < deadline:
+            await asyncio.sleep(cache_settings.distributed_lock_poll_interval_sec)
+            data = await self.retrieve_from_cache(key)
+            if data or data is NOT_FOUND:
+                return data
+            if not await self.redis_client.exists(f'lock:{key}'):
+                # The holder may have saved the data right between the two reads: read once more
+                data = await self.retrieve_from_cache(key)
+                return data if data or data is NOT_FOUND else None
+        return None
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0  # removed because the cache was full (LRU)
+    expirations: int = 0  # removed because the TTL has passed
+
+    def to_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+class LocalCacheService(CacheService):
+    """
+    In-process LRU cache with TTL.
+    Objects are stored already deserialized, so a hit costs neither a Redis round trip nor 'orjson.loads'.
+    """
+
+    def __init__(self, max_size: int, expiration_time_sec: int, enabled: bool = True):
+        self.max_size = max_size
+        self.expiration_time_sec = expiration_time_sec
+        self.enabled = enabled
+        self.stats = CacheStats()
+        self._data: OrderedDict[str, tuple[float, Any, str | None]] = OrderedDict()  # key: (expires_at, data, etag)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    async def add_to_cache(self, key: str, data: Any, etag: str | None = None) -> None:
+        """Put data (and its ETag) to cache (the least recently used item is evicted if the cache is full)."""
+
+        if not self.enabled:
+            return
+        self._data[key] = (time.monotonic() + self.expiration_time_sec, data, etag)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.stats.evictions += 1
+
+    async def retrieve_from_cache(self, key: str) -> Any | None:
         """Get data from cache."""
 
-        json_data = await self.redis_client.get(key)
-        return orjson.loads(json_data) if json_data else None
+        entry = await self.retrieve_entry(key)
+        return entry[0] if entry else None
+
+    async def retrieve_entry(self, key: str) -> tuple[Any, str | None] | None:
+        """Get data from cache with its ETag."""
+
+        if not self.enabled:
+            return None
+        item = self._data.get(key)
+        if item is None:
+            self.stats.misses += 1
+            return None
+        expires_at, data, etag = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.stats.hits += 1
+        return data, etag
+
+    def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._data.pop(key, None)
+
+    def delete_prefix(self, *prefixes: str) -> None:
+        for key in [key for key in self._data if key.startswith(prefixes)]:
+            del self._data[key]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+# One instance per worker process: shared by all services
+local_cache_service = LocalCacheService(
+    max_size=cache_settings.local_cache_max_size,
+    expiration_time_sec=cache_settings.local_cache_expiration_time_sec,
+    enabled=cache_settings.local_cache_enabled,
+)
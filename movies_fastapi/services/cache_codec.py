@@ -0,0 +1,112 @@
+import logging
+import time
+import zlib
+from dataclasses import dataclass, asdict
+from typing import Callable
+
+from core.config import cache_settings
+from core.exeptions import UnknownCodecError
+from core.metrics import CACHE_COMPRESSION_BYTES, CACHE_COMPRESSION_DURATION
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+logger = logging.getLogger(__name__)
+
+# The first byte of a compressed payload: the codec. JSON never starts with these bytes,
+# so the uncompressed payloads are stored as is (and the entries written before stay readable)
+CODEC_HEADERS: dict[str, bytes] = {
+    'zlib': b'\x01',
+    'zstd': b'\x02',
+    'lz4': b'\x03',
+}
+
+
+@dataclass
+class CodecStats:
+    compressed: int = 0  # payloads stored compressed
+    skipped: int = 0  # payloads stored as is (smaller than 'min_size' or incompressible)
+    raw_bytes: int = 0  # size of the compressed payloads before compression
+    compressed_bytes: int = 0
+    encode_time_sec: float = 0
+    decompressed: int = 0
+    decode_time_sec: float = 0
+
+    @property
+    def compression_ratio(self) -> float:
+        return self.raw_bytes / self.compressed_bytes if self.compressed_bytes else 0
+
+    def to_dict(self) -> dict[str, int | float]:
+        return {**asdict(self), 'compression_ratio': round(self.compression_ratio, 2)}
+
+
+def _codecs() -> dict[str, tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]]:
+    """(compress, decompress) of the available codecs ('zstd' and 'lz4' are optional dependencies)."""
+
+    codecs = {'zlib': (zlib.compress, zlib.decompress)}
+    if zstandard is not None:
+        codecs['zstd'] = (zstandard.ZstdCompressor().compress, zstandard.ZstdDecompressor().decompress)
+    if lz4 is not None:
+        codecs['lz4'] = (lz4.frame.compress, lz4.frame.decompress)
+    return codecs
+
+
+class PayloadCodec:
+    """
+    Compression of the cache payloads: a payload of at least 'min_size' bytes is compressed by 'codec'
+    and prefixed with the codec header byte. Any installed codec is decoded, whatever 'codec' is set now.
+    """
+
+    def __init__(self, codec: str = 'none', min_size: int = 1024):
+        self._codecs = _codecs()
+        self._decompressors = {
+            CODEC_HEADERS[name][0]: (name, decompress) for name, (_, decompress) in self._codecs.items()
+        }
+        if codec != 'none' and codec not in self._codecs:
+            raise ValueError('Codec "{}" is not installed (see requirements.txt)'.format(codec))
+        self.codec = codec
+        self.min_size = min_size
+        self.stats = CodecStats()
+
+    def encode(self, value: bytes) -> bytes:
+        if self.codec == 'none' or len(value) < self.min_size:
+            self.stats.skipped += 1
+            return value
+        start = time.perf_counter()
+        compress, _ = self._codecs[self.codec]
+        encoded = CODEC_HEADERS[self.codec] + compress(value)
+        duration = time.perf_counter() - start
+        self.stats.encode_time_sec += duration
+        CACHE_COMPRESSION_DURATION.labels(self.codec, 'encode').observe(duration)
+        if len(encoded) >= len(value):
+            self.stats.skipped += 1
+            return value
+        self.stats.compressed += 1
+        self.stats.raw_bytes += len(value)
+        self.stats.compressed_bytes += len(encoded)
+        CACHE_COMPRESSION_BYTES.labels(self.codec, 'raw').inc(len(value))
+        CACHE_COMPRESSION_BYTES.labels(self.codec, 'stored').inc(len(encoded))
+        return encoded
+
+    def decode(self, value: bytes) -> bytes:
+        if value[0] not in self._decompressors:
+            if value[:1] in CODEC_HEADERS.values():
+                raise UnknownCodecError('Payload is compressed by a codec that is not installed')
+            return value
+        codec, decompress = self._decompressors[value[0]]
+        start = time.perf_counter()
+        decoded = decompress(value[1:])
+        duration = time.perf_counter() - start
+        self.stats.decode_time_sec += duration
+        self.stats.decompressed += 1
+        CACHE_COMPRESSION_DURATION.labels(codec, 'decode').observe(duration)
+        return decoded
+
+
+payload_codec = PayloadCodec(cache_settings.cache_compression_codec, cache_settings.cache_compression_min_size)
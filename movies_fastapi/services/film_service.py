@@ -6,12 +6,12 @@ from elasticsearch import AsyncElasticsearch
 from fastapi import Depends
 from redis.asyncio import Redis
 
-from api.v1.schemas.film_schema import FilmDetails, FilmQueryExact
+from api.v1.schemas.film_schema import FilmBase, FilmDetails, FilmQueryExact
 from api.v1.schemas.query_params import FilmTotalParam, FilmListParam
 from core.config import es_settings
 from db.elastic import get_elastic
 from db.redis import get_redis
-from services.base_service import ElasticsearchDBService
+from services.base_service import ElasticsearchDBService, SearchResult, source_fields
 
 
 class FilmService:
@@ -24,17 +24,28 @@ class FilmService:
         film = await self.es_service.get_by_id(self.index_name, film_id)
         return film
 
-    async def get_film_by_fields(self, film_data: FilmQueryExact) -> list[FilmDetails] | None:
-        films = await self.es_service.get_exact_match(self.index_name, film_data)
+    async def get_films_by_uuids(self, film_ids: list[UUID]) -> list[FilmDetails]:
+        films = await self.es_service.get_by_ids(self.index_name, film_ids)
         return films
 
-    async def get_films_by_search(self, query_params: FilmTotalParam) -> list[FilmDetails] | None:
-        films = await self.es_service.get_list(self.index_name, query_params)
-        return films if films else None  # because an empty sheet may return (in 'films')
+    async def get_film_by_fields(self, film_data: FilmQueryExact) -> SearchResult | None:
+        films = await self.es_service.get_exact_match(
+            self.index_name, film_data, source_includes=list(source_fields(FilmDetails))
+        )
+        return films
+
+    async def get_films_by_search(self, query_params: FilmTotalParam) -> SearchResult | None:
+        films = await self.es_service.get_list(
+            self.index_name, query_params, source_includes=list(source_fields(FilmDetails))
+        )
+        return films
 
-    async def get_films_list(self, query_params: FilmListParam) -> list[FilmDetails] | None:
-        films = await self.es_service.get_list(self.index_name, query_params)
-        return films if films else None  # because an empty sheet may return (in 'films')
+    async def get_films_list(self, query_params: FilmListParam) -> SearchResult | None:
+        # Only the fields of 'FilmBase' are returned by the list endpoint
+        films = await self.es_service.get_list(
+            self.index_name, query_params, source_includes=list(source_fields(FilmBase))
+        )
+        return films
 
 
 @lru_cache()
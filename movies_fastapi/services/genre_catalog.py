@@ -0,0 +1,84 @@
+import asyncio
+import logging
+from typing import Any
+from uuid import UUID
+
+from elasticsearch import AsyncElasticsearch, NotFoundError
+
+from core.config import cache_settings, es_settings
+
+logger = logging.getLogger(__name__)
+
+
+class GenreCatalog:
+    """
+    In-process snapshot of the whole 'genres' index (it is tiny and changes rarely):
+    the genres in the index order, uuid -> name and name -> uuid (case-insensitive).
+    Loaded at startup, reloaded on schedule and on ETL notification (see 'services.invalidation').
+    The genre list is served from it without Redis and Elasticsearch,
+    the other services use it to resolve genre names (e.g. the 'genre_name' filter of films).
+    Until it is loaded (e.g. no index at startup) 'loaded' is False and the callers fall back to Elasticsearch.
+    """
+
+    def __init__(self, index_name: str, enabled: bool = True):
+        self.index_name = index_name
+        self.enabled = enabled
+        self.loaded = False
+        self._genres: list[dict[str, Any]] = []
+        self._names: dict[UUID, str] = {}
+        self._uuids: dict[str, UUID] = {}
+        self._es_client: AsyncElasticsearch | None = None
+        self._reload_task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._genres)
+
+    async def load(self, es_client: AsyncElasticsearch) -> None:
+        if not self.enabled:
+            return
+        self._es_client = es_client
+        try:
+            response = await es_client.search(
+                index=self.index_name,
+                size=cache_settings.genre_catalog_max_size,
+                sort=['_doc'],
+                source_includes=['uuid', 'name'],
+            )
+        except NotFoundError:
+            logger.warning('Index "{}" not found, genre catalog is not loaded'.format(self.index_name))
+            return
+        genres = [hit['_source'] for hit in response['hits']['hits']]
+        # The maps are built aside and swapped at once: the readers never see a partial snapshot
+        self._names = {UUID(genre['uuid']): genre['name'] for genre in genres}
+        self._uuids = {genre['name'].lower(): UUID(genre['uuid']) for genre in genres}
+        self._genres = genres
+        self.loaded = True
+        logger.info('Genre catalog loaded: {} genres'.format(len(genres)))
+
+    def reload(self) -> None:
+        """Reload in the background (if it is not running yet)."""
+
+        if self._es_client is None:
+            return
+        if self._reload_task is None or self._reload_task.done():
+            self._reload_task = asyncio.create_task(self.load(self._es_client))
+
+    def get_page(self, page_number: int, page_size: int) -> dict[str, Any] | None:
+        """A page of genres as 'SearchResult' (None if the page is empty)."""
+
+        start = (page_number - 1) * page_size
+        items = self._genres[start:start + page_size]
+        if not items:
+            return None
+        return {'total': len(self._genres), 'total_relation': 'eq', 'items': items, 'next_cursor': None}
+
+    def get_name(self, genre_uuid: UUID) -> str | None:
+        return self._names.get(genre_uuid)
+
+    def get_uuid(self, genre_name: str) -> UUID | None:
+        return self._uuids.get(genre_name.lower())
+
+
+genre_catalog = GenreCatalog(
+    index_name=es_settings.es_indexes['genres']['index_name'], enabled=cache_settings.genre_catalog_enabled
+)
@@ -10,7 +10,8 @@ from api.v1.schemas.query_params import PageParam
 from core.config import es_settings
 from db.elastic import get_elastic
 from db.redis import get_redis
-from services.base_service import ElasticsearchDBService
+from services.base_service import ElasticsearchDBService, SearchResult, source_fields
+from services.genre_catalog import genre_catalog
 
 
 class GenreService:
@@ -18,9 +19,13 @@ class GenreService:
         self.es_service = ElasticsearchDBService(elastic, redis)
         self.index_name = index_name
 
-    async def get_genres_list(self, query_params: PageParam) -> list[GenreBase] | None:
-        genres = await self.es_service.get_list(self.index_name, query_params)
-        return genres if genres else None  # because an empty sheet may return (in 'genres')
+    async def get_genres_list(self, query_params: PageParam) -> SearchResult | None:
+        if genre_catalog.loaded:
+            return genre_catalog.get_page(query_params.page_number, query_params.page_size)
+        genres = await self.es_service.get_list(
+            self.index_name, query_params, source_includes=list(source_fields(GenreBase))
+        )
+        return genres
 
 
 @lru_cache()
@@ -0,0 +1,144 @@
+import asyncio
+import contextlib
+import logging
+import time
+import uuid
+from functools import lru_cache
+from typing import Annotated, TYPE_CHECKING
+from uuid import UUID
+
+import orjson
+from fastapi import Depends
+from redis.asyncio import Redis
+
+from core.config import cache_settings, es_settings, redis_settings
+from core.utils import index_generations
+from db.redis import get_redis
+from services.base_service import ElasticsearchDBService, local_cache_service
+from services.genre_catalog import genre_catalog
+
+if TYPE_CHECKING:
+    from services.warmup import CacheWarmer
+
+logger = logging.getLogger(__name__)
+
+KEYSPACE = '{}:v{}'.format(cache_settings.cache_key_prefix, cache_settings.cache_key_version)
+# Methods whose entries depend on the whole index (not on one document)
+INDEX_SCOPED_METHODS = ('get_list', 'get_exact_match')
+
+
+class CacheInvalidator:
+    """
+    Event-driven cache invalidation.
+    The ETL (or the admin API) bumps the generation of the index (see 'core.utils.IndexGenerations')
+    and publishes it with the ids of the written documents to 'redis_invalidation_channel'.
+    Every worker switches to the new generation (all list and search entries of the index are retired at once,
+    without scanning Redis) and evicts the by-id entries of these documents from Redis and from its local cache.
+    So the cache TTLs can be long without serving stale data.
+    After an ETL cycle a 'warmup' event is published: the cache is warmed up ('warmer').
+    """
+
+    def __init__(self, redis_client: Redis, warmer: 'CacheWarmer | None' = None):
+        self.redis_client = redis_client
+        self.warmer = warmer
+        self._warmup_task: asyncio.Task | None = None
+
+    @staticmethod
+    def generation_key(index_name: str) -> str:
+        return redis_settings.redis_generation_key.format(index_name=index_name)
+
+    async def load_generations(self) -> None:
+        """Load the current generations of all indexes from Redis."""
+
+        index_names = [index['index_name'] for index in es_settings.es_indexes.values()]
+        generations = await self.redis_client.mget([self.generation_key(index_name) for index_name in index_names])
+        for index_name, generation in zip(index_names, generations):
+            index_generations.set(index_name, int(generation or 0))
+        logger.info('Cache generations loaded: {}'.format(index_generations.to_dict()))
+
+    async def bump_generation(self, index_name: str) -> int:
+        """Retire all the cache entries of the index in all workers."""
+
+        key = self.generation_key(index_name)
+        # The counter is seeded with the current time: it keeps growing even if Redis has lost it
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            _, generation = await pipe.set(key, int(time.time()), nx=True).incr(key).execute()
+        message = {
+            'id': str(uuid.uuid4()), 'event': 'invalidate', 'index_name': index_name, 'ids': [], 'generation': generation
+        }
+        await self.redis_client.publish(redis_settings.redis_invalidation_channel, orjson.dumps(message))
+        await self.invalidate(index_name, [], generation=generation)
+        return generation
+
+    async def invalidate(
+            self, index_name: str, ids: list[str], message_id: str | None = None, generation: int | None = None
+    ) -> None:
+        if generation is not None:
+            index_generations.set(index_name, generation)
+        if index_name == genre_catalog.index_name:
+            genre_catalog.reload()
+        by_id_keys = [ElasticsearchDBService.get_by_id.make_key(None, index_name, UUID(doc_id)) for doc_id in ids]
+
+        # Local cache: in every worker (the entries of the old generations are just unreachable, free the memory)
+        local_cache_service.delete(*by_id_keys)
+        local_cache_service.delete_prefix(*[f'{KEYSPACE}:{method}:{index_name}:' for method in INDEX_SCOPED_METHODS])
+        if not by_id_keys:
+            return
+
+        # Redis: by one worker per message
+        if message_id is not None:
+            marker = f'{KEYSPACE}:invalidated:{message_id}'
+            if not await self.redis_client.set(marker, 1, nx=True, ex=redis_settings.redis_cache_expiration_time_sec):
+                return
+        deleted = await self.redis_client.unlink(*by_id_keys)
+        logger.info('Cache invalidated for {} documents of "{}" (generation {}): {} keys deleted'.format(
+            len(ids), index_name, index_generations.get(index_name), deleted
+        ))
+
+    def warm_up(self) -> None:
+        """Start the warm-up in the background (if it is not running in this worker yet)."""
+
+        if self.warmer is None or not cache_settings.warmup_enabled:
+            return
+        if self._warmup_task is None or self._warmup_task.done():
+            self._warmup_task = asyncio.create_task(self.warmer.run())
+
+    async def listen(self, channel: str = redis_settings.redis_invalidation_channel) -> None:
+        """Subscribe to the channel and invalidate the cache on each message (to be run as a background task)."""
+
+        while True:
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(channel)
+                logger.info('Subscribed to "{}"'.format(channel))
+                # The bumps made while the worker was not subscribed
+                await self.load_generations()
+                async for message in pubsub.listen():
+                    try:
+                        data = orjson.loads(message['data'])
+                        if data.get('event') == 'warmup':
+                            self.warm_up()
+                        else:
+                            await self.invalidate(
+                                data['index_name'], data['ids'], data.get('id'), data.get('generation')
+                            )
+                    except Exception:
+                        logger.exception('Failed to process invalidation message: {}'.format(message['data']))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Invalidation subscription failed, resubscribing')
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    async def close(self) -> None:
+        if self._warmup_task is not None:
+            self._warmup_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._warmup_task
+
+
+@lru_cache()
+def get_cache_invalidator(redis: Annotated[Redis, Depends(get_redis)]) -> CacheInvalidator:
+    return CacheInvalidator(redis)
@@ -0,0 +1,54 @@
+import logging
+
+from elasticsearch import AsyncElasticsearch, NotFoundError
+
+from core.config import es_settings
+
+logger = logging.getLogger(__name__)
+
+
+class IndexMappingRegistry:
+    """
+    Field names for the exact search, per index (e.g. 'title' -> 'title.raw').
+    The mappings are loaded from Elasticsearch once (at startup, on schedule or on demand)
+    and the lookups are served from memory, so the exact search costs no extra 'get_mapping' request.
+    """
+
+    def __init__(self):
+        self._exact_fields: dict[str, dict[str, str]] = {}
+
+    @staticmethod
+    def _resolve_exact_fields(properties: dict) -> dict[str, str]:
+        """A text field with a 'raw' keyword subfield can be matched exactly only by its raw form."""
+
+        exact_fields = {}
+        for field, field_mapping in properties.items():
+            match field_mapping:
+                case {'type': 'text', 'fields': {'raw': {'type': 'keyword'}}}:
+                    exact_fields[field] = f'{field}.raw'
+                case _:
+                    exact_fields[field] = field
+        return exact_fields
+
+    async def load(self, es_client: AsyncElasticsearch, *index_names: str) -> None:
+        """Load (reload) mappings for the indexes (all from 'es_settings.es_indexes' by default)."""
+
+        index_names = index_names or tuple(index['index_name'] for index in es_settings.es_indexes.values())
+        for index_name in index_names:
+            try:
+                mapping = await es_client.indices.get_mapping(index=index_name)
+            except NotFoundError:
+                logger.warning('Index "{}" not found, its mapping will be loaded on first use'.format(index_name))
+                self._exact_fields.pop(index_name, None)
+                continue
+            properties = mapping[index_name]['mappings'].get('properties', {})
+            self._exact_fields[index_name] = self._resolve_exact_fields(properties)
+        logger.info('Index mappings loaded: {}'.format(list(self._exact_fields)))
+
+    async def get_exact_fields(self, es_client: AsyncElasticsearch, index_name: str) -> dict[str, str]:
+        if index_name not in self._exact_fields:
+            await self.load(es_client, index_name)
+        return self._exact_fields.get(index_name, {})
+
+
+mapping_registry = IndexMappingRegistry()
@@ -11,7 +11,7 @@ from db.redis import get_redis
 from elasticsearch import AsyncElasticsearch
 from fastapi import Depends, Request
 from redis.asyncio import Redis
-from services.base_service import ElasticsearchDBService, RedisCacheService
+from services.base_service import ElasticsearchDBService, RedisCacheService, SearchResult, source_fields
 
 
 class PersonService:
@@ -24,15 +24,23 @@ class PersonService:
         person = await self.es_service.get_by_id(self.index_name, person_id)
         return person
 
-    async def get_person_by_name(self, full_name: str) -> list[PersonDetails] | None:
+    async def get_persons_by_uuids(self, person_ids: list[UUID]) -> list[PersonDetails]:
+        persons = await self.es_service.get_by_ids(self.index_name, person_ids)
+        return persons
+
+    async def get_person_by_name(self, full_name: str) -> SearchResult | None:
         obj_in = PersonName(full_name=full_name)
         # Why persons, not a person: because a complete namesake situation is theoretically possible.
-        persons = await self.es_service.get_exact_match(self.index_name, obj_in)
+        persons = await self.es_service.get_exact_match(
+            self.index_name, obj_in, source_includes=list(source_fields(PersonDetails))
+        )
         return persons
 
-    async def get_persons_by_search(self, query_params: SearchParam) -> list[PersonDetails] | None:
-        persons = await self.es_service.get_list(self.index_name, query_params)
-        return persons if persons else None
+    async def get_persons_by_search(self, query_params: SearchParam) -> SearchResult | None:
+        persons = await self.es_service.get_list(
+            self.index_name, query_params, source_includes=list(source_fields(PersonDetails))
+        )
+        return persons
 
 
 @lru_cache()
@@ -0,0 +1,73 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from elasticsearch import AsyncElasticsearch
+from redis.asyncio import Redis
+
+from api.v1.schemas.query_params import FilmListParam, PageParam
+from core.config import cache_settings, es_settings
+from services.film_service import FilmService
+from services.genre_service import GenreService
+
+logger = logging.getLogger(__name__)
+
+WARMUP_LOCK = '{}:v{}:warmup'.format(cache_settings.cache_key_prefix, cache_settings.cache_key_version)
+
+
+class CacheWarmer:
+    """
+    Cache warm-up: the hot queries are precomputed and cached before the users ask for them
+    (at startup and after an ETL cycle), so a cold cache doesn't send a burst of requests to Elasticsearch.
+    The hot queries (see 'CacheSettings.warmup_*'): the genre list, the first pages of films sorted by rating
+    and the first pages of films of each genre. They are made through the services (the same cache keys
+    as the requests) with at most 'warmup_concurrency' at a time.
+    Only one worker in the cluster warms up the shared cache at a time.
+    """
+
+    def __init__(self, elastic: AsyncElasticsearch, redis: Redis):
+        self.redis = redis
+        self.film_service = FilmService(elastic, redis, index_name=es_settings.es_indexes['movies']['index_name'])
+        self.genre_service = GenreService(elastic, redis, index_name=es_settings.es_indexes['genres']['index_name'])
+
+    def _film_pages(self, genre_name: str | None = None) -> list[Callable[[], Awaitable]]:
+        pages = cache_settings.warmup_genre_film_pages if genre_name else cache_settings.warmup_film_pages
+        return [
+            lambda page_number=page_number: self.film_service.get_films_list(
+                FilmListParam(page_number=page_number, genre_name=genre_name)
+            )
+            for page_number in range(1, pages + 1)
+        ]
+
+    async def _genre_names(self) -> list[str]:
+        genres = await self.genre_service.get_genres_list(PageParam(page_size=cache_settings.warmup_max_genres))
+        return [genre['name'] for genre in genres['items']] if genres else []
+
+    async def run(self) -> None:
+        if not await self.redis.set(WARMUP_LOCK, 1, nx=True, ex=cache_settings.warmup_lock_timeout_sec):
+            logger.info('Cache warm-up is already running in another worker')
+            return
+        try:
+            queries = [lambda: self.genre_service.get_genres_list(PageParam()), *self._film_pages()]
+            if cache_settings.warmup_genre_film_pages:
+                try:
+                    for genre_name in await self._genre_names():
+                        queries.extend(self._film_pages(genre_name))
+                except Exception:
+                    logger.exception('Failed to get genres for cache warm-up')
+
+            semaphore = asyncio.Semaphore(cache_settings.warmup_concurrency)
+
+            async def warm(query: Callable[[], Awaitable]) -> bool:
+                async with semaphore:
+                    try:
+                        await query()
+                        return True
+                    except Exception:
+                        logger.exception('Cache warm-up query failed')
+                        return False
+
+            results = await asyncio.gather(*[warm(query) for query in queries])
+            logger.info('Cache warm-up is completed: {} of {} queries'.format(sum(results), len(results)))
+        finally:
+            await self.redis.delete(WARMUP_LOCK)
@@ -1,4 +1,5 @@
 import asyncio
+from http import HTTPStatus
 from typing import Any, AsyncGenerator, Callable, Coroutine
 
 import pytest
@@ -41,12 +42,16 @@ def make_get_request(
     async def inner(
             endpoint: str,
             params: dict | None = None,
+            headers: dict | None = None,
+            app_url: str | None = None,
     ) -> dict[str, Any]:
         params = params or {}
-        url = f"{test_settings.app_url}{endpoint}"
-        async with a_client.get(url=url, params=params) as resp:
+        headers = headers or {}
+        url = f"{app_url or test_settings.app_url}{endpoint}"
+        async with a_client.get(url=url, params=params, headers=headers) as resp:
             return {
-                'body': await resp.json(),
+                # 304 (Not Modified) has no body
+                'body': await resp.json() if resp.status != HTTPStatus.NOT_MODIFIED else None,
                 'status': resp.status,
                 'headers': resp.headers,
                 'url': resp.url,
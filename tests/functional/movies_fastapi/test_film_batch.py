@@ -0,0 +1,75 @@
+import json
+from http import HTTPStatus
+
+import pytest
+
+from functional.settings import IndexName, test_settings
+from functional.testdata.film_data import get_films_to_load
+
+INDEX_NAME = IndexName.MOVIES.value
+ENDPOINT_BATCH = f'{test_settings.prefix}/{INDEX_NAME}/batch'
+UNKNOWN_UUID = '00000000-0000-0000-0000-000000000000'
+
+
+@pytest.mark.parametrize(
+    'number, add_unknown, expected_response',
+    [
+        (5, False, {'length': 5, 'status': HTTPStatus.OK}),
+        (5, True, {'length': 5, 'status': HTTPStatus.OK}),
+        (0, True, {'length': 1, 'status': HTTPStatus.NOT_FOUND}),
+    ],
+)
+async def test_film_batch_status(
+        es_load, make_post_request, number, add_unknown, expected_response
+):
+    """Check the batch lookup: found films are returned in the requested order, unknown ones are skipped."""
+
+    film_data_in = get_films_to_load(10)
+    await es_load(INDEX_NAME, film_data_in)
+
+    uuids = [film['uuid'] for film in film_data_in[:number]]
+    if add_unknown:
+        uuids.append(UNKNOWN_UUID)
+
+    response = await make_post_request(
+        ENDPOINT_BATCH,
+        data=json.dumps({'uuids': uuids}),
+        headers={"Content-Type": "application/json"},
+    )
+
+    assert response['status'] == expected_response['status']
+    assert len(response['body']) == expected_response['length']
+    if expected_response['status'] == HTTPStatus.OK:
+        assert [film['uuid'] for film in response['body']] == uuids[:number]
+
+
+async def test_film_batch_cache(
+        es_load,
+        make_get_request,
+        make_post_request,
+):
+    """Check that the batch lookup shares the cache with the lookup by uuid."""
+
+    film_data_in = get_films_to_load(2)
+    await es_load(INDEX_NAME, film_data_in)
+    cached_film = film_data_in[0]
+    old_title = cached_film['title']
+
+    # 1) Put the first film into the cache by the lookup by uuid
+    response = await make_get_request(f'{test_settings.prefix}/{INDEX_NAME}/exact_search/{cached_film["uuid"]}')
+    assert response['status'] == HTTPStatus.OK
+
+    # 2) Change both films in the elastic
+    for film in film_data_in:
+        film['title'] = 'New film title'
+    await es_load(INDEX_NAME, film_data_in)
+
+    # The first film is returned from the cache (old title), the second one from the elastic (new title)
+    response = await make_post_request(
+        ENDPOINT_BATCH,
+        data=json.dumps({'uuids': [film['uuid'] for film in film_data_in]}),
+        headers={"Content-Type": "application/json"},
+    )
+
+    assert response['status'] == HTTPStatus.OK
+    assert [film['title'] for film in response['body']] == [old_title, 'New film title']
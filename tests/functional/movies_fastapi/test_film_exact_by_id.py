@@ -1,99 +1,219 @@
-from copy import deepcopy
-from http import HTTPStatus
-
-import pytest
-from redis.asyncio import Redis
-
-from functional.settings import IndexName, test_settings
-from functional.testdata.film_data import film_to_load
-
-INDEX_NAME = IndexName.MOVIES.value
-ENDPOINT_EXACT_SEARCH = f'{test_settings.prefix}/{INDEX_NAME}/exact_search'
-
-
-@pytest.mark.parametrize(
-    'film_uuid, expected_response',
-    [
-        (
-                {'uuid': '3d825f60-9fff-4dfe-b294-1a45fa1e115d'},
-                {'status': HTTPStatus.OK},
-        ),
-        (
-                {'uuid': '00000000-0000-0000-0000-000000000000'},
-                {'status': HTTPStatus.NOT_FOUND},
-        ),
-        (
-                {'uuid': '88888888-8888-8888-8888-888888888888'},
-                {'status': HTTPStatus.OK},
-        ),
-    ],
-)
-async def test_film_details_status(
-        es_load, make_get_request, film_uuid, expected_response
-):
-    """Check the success of the data return"""
-
-    film_data_in = [
-        film_to_load['film 1'],
-        film_to_load['film 2'],
-    ]
-    endpoint = f'{ENDPOINT_EXACT_SEARCH}/{film_uuid["uuid"]}'
-    # load data to elastic
-    await es_load(INDEX_NAME, film_data_in)
-    response = await make_get_request(endpoint)
-
-    assert response['status'] == expected_response['status']
-
-
-async def test_film_details_fields(
-        es_load,
-        make_get_request,
-):
-    """Check the correctness and completeness of the data return."""
-
-    film_data_in = film_to_load['film 1']
-    endpoint = f'{ENDPOINT_EXACT_SEARCH}/{film_data_in["uuid"]}'
-
-    await es_load(INDEX_NAME, [film_data_in])
-    response = await make_get_request(endpoint)
-
-    assert response['body'] == film_data_in
-    assert response['status'] == HTTPStatus.OK
-
-
-async def test_film_details_cache(
-        es_load,
-        make_get_request,
-        redis_client: Redis,
-):
-    """Check the cache operation."""
-
-    film_data_in = deepcopy(film_to_load['film 1'])
-    endpoint = f'{ENDPOINT_EXACT_SEARCH}/{film_data_in["uuid"]}'
-
-    film_title = film_data_in['title']
-    new_film_title = 'New film title'
-
-    # 1) load data to elastic (Just 'film_title' is enough)
-    await es_load(INDEX_NAME, [film_data_in])
-    # make get request
-    response = await make_get_request(endpoint)
-
-    assert response['body']['title'] == film_title
-
-    # 2) Change the name of the film in the elastic document to 'new_film_title (uuid is the same)'
-    # film_data_in = {'uuid': film_data_in['uuid'], 'title': new_film_title}
-    film_data_in['title'] = new_film_title
-    await es_load(INDEX_NAME, [film_data_in])
-
-    # make the same request as in the first stage
-    response = await make_get_request(endpoint)
-
-    # Check that the cache is working - the old name ('film_title') has returned from the cache
-    assert response['body']['title'] == film_title
-
-    # 3) Reset the redis cache. Now the current title of the film is returned ('new_film_title')
-    await redis_client.flushall()
-    response = await make_get_request(endpoint)
-
-    assert response['body']['title'] == new_film_title
+import uuid
+from copy import deepcopy
+from http import HTTPStatus
+
+import pytest
+from aiohttp import ClientSession
+from redis.asyncio import Redis
+
+from functional.settings import IndexName, test_settings
+from functional.testdata.film_data import film_to_load
+
+INDEX_NAME = IndexName.MOVIES.value
+ENDPOINT_EXACT_SEARCH = f'{test_settings.prefix}/{INDEX_NAME}/exact_search'
+
+
+@pytest.mark.parametrize(
+    'film_uuid, expected_response',
+    [
+        (
+                {'uuid': '3d825f60-9fff-4dfe-b294-1a45fa1e115d'},
+                {'status': HTTPStatus.OK},
+        ),
+        (
+                {'uuid': '00000000-0000-0000-0000-000000000000'},
+                {'status': HTTPStatus.NOT_FOUND},
+        ),
+        (
+                {'uuid': '88888888-8888-8888-8888-888888888888'},
+                {'status': HTTPStatus.OK},
+        ),
+    ],
+)
+async def test_film_details_status(
+        es_load, make_get_request, film_uuid, expected_response
+):
+    """Check the success of the data return"""
+
+    film_data_in = [
+        film_to_load['film 1'],
+        film_to_load['film 2'],
+    ]
+    endpoint = f'{ENDPOINT_EXACT_SEARCH}/{film_uuid["uuid"]}'
+    # load data to elastic
+    await es_load(INDEX_NAME, film_data_in)
+    response = await make_get_request(endpoint)
+
+    assert response['status'] == expected_response['status']
+
+
+async def test_film_details_fields(
+        es_load,
+        make_get_request,
+):
+    """Check the correctness and completeness of the data return."""
+
+    film_data_in = film_to_load['film 1']
+    endpoint = f'{ENDPOINT_EXACT_SEARCH}/{film_data_in["uuid"]}'
+
+    await es_load(INDEX_NAME, [film_data_in])
+    response = await make_get_request(endpoint)
+
+    assert response['body'] == film_data_in
+    assert response['status'] == HTTPStatus.OK
+
+
+async def test_film_details_cache(
+        es_load,
+        make_get_request,
+        redis_client: Redis,
+):
+    """Check the cache operation."""
+
+    film_data_in = deepcopy(film_to_load['film 1'])
+    endpoint = f'{ENDPOINT_EXACT_SEARCH}/{film_data_in["uuid"]}'
+
+    film_title = film_data_in['title']
+    new_film_title = 'New film title'
+
+    # 1) load data to elastic (Just 'film_title' is enough)
+    await es_load(INDEX_NAME, [film_data_in])
+    # make get request
+    response = await make_get_request(endpoint)
+
+    assert response['body']['title'] == film_title
+
+    # 2) Change the name of the film in the elastic document to 'new_film_title (uuid is the same)'
+    # film_data_in = {'uuid': film_data_in['uuid'], 'title': new_film_title}
+    film_data_in['title'] = new_film_title
+    await es_load(INDEX_NAME, [film_data_in])
+
+    # make the same request as in the first stage
+    response = await make_get_request(endpoint)
+
+    # Check that the cache is working - the old name ('film_title') has returned from the cache
+    assert response['body']['title'] == film_title
+
+    # 3) Reset the redis cache. Now the current title of the film is returned ('new_film_title')
+    await redis_client.flushall()
+    response = await make_get_request(endpoint)
+
+    assert response['body']['title'] == new_film_title
+
+
+async def test_film_details_etag(
+        es_load,
+        make_get_request,
+):
+    """
+    Check the conditional GET: 304 without the body for the matching ETag,
+    answered from the cache entry (the data is not validated and serialized again).
+    """
+
+    film_data_in = film_to_load['film 1']
+    endpoint = f'{ENDPOINT_EXACT_SEARCH}/{film_data_in["uuid"]}'
+
+    await es_load(INDEX_NAME, [film_data_in])
+    response = await make_get_request(endpoint)
+
+    assert response['status'] == HTTPStatus.OK
+    etag = response['headers']['ETag']
+
+    response = await make_get_request(endpoint, headers={'If-None-Match': etag})
+
+    assert response['status'] == HTTPStatus.NOT_MODIFIED
+    assert response['body'] is None
+    assert response['headers']['ETag'] == etag
+    stages = {metric.split(';')[0].strip() for metric in response['headers']['Server-Timing'].split(',')}
+    assert 'cache' in stages
+    assert not {'es', 'validate', 'serialize'} & stages
+
+    response = await make_get_request(endpoint, headers={'If-None-Match': '"another-etag"'})
+
+    assert response['status'] == HTTPStatus.OK
+    assert response['body'] == film_data_in
+
+
+async def test_film_details_not_found_cache(
+        es_load,
+        make_get_request,
+        redis_client: Redis,
+):
+    """Check that "not found" is cached too."""
+
+    film_data_in = deepcopy(film_to_load['film 1'])
+    endpoint = f'{ENDPOINT_EXACT_SEARCH}/{film_data_in["uuid"]}'
+
+    # 1) The film is not in the elastic yet
+    response = await make_get_request(endpoint)
+    assert response['status'] == HTTPStatus.NOT_FOUND
+
+    # 2) Load the film: "not found" is returned from the cache
+    await es_load(INDEX_NAME, [film_data_in])
+    response = await make_get_request(endpoint)
+    assert response['status'] == HTTPStatus.NOT_FOUND
+
+    # 3) Reset the redis cache. Now the film is found
+    await redis_client.flushall()
+    response = await make_get_request(endpoint)
+    assert response['status'] == HTTPStatus.OK
+
+
+async def test_film_details_server_timing(
+        es_load,
+        make_get_request,
+):
+    """Check the 'Server-Timing' header: the first request goes to the elastic, the second one to the cache."""
+
+    film_data_in = film_to_load['film 1']
+    endpoint = f'{ENDPOINT_EXACT_SEARCH}/{film_data_in["uuid"]}'
+    await es_load(INDEX_NAME, [film_data_in])
+
+    response = await make_get_request(endpoint)
+    stages = {metric.split(';')[0].strip() for metric in response['headers']['Server-Timing'].split(',')}
+    assert {'cache', 'es', 'total'} <= stages
+
+    response = await make_get_request(endpoint)
+    stages = {metric.split(';')[0].strip() for metric in response['headers']['Server-Timing'].split(',')}
+    assert 'cache' in stages
+    assert 'es' not in stages
+
+
+async def test_film_details_fallback(
+        es_load,
+        make_get_request,
+        a_client: ClientSession,
+        redis_client: Redis,
+):
+    """
+    Check the open Elasticsearch circuit (the API without Elasticsearch, see 'test_movies_fastapi_degraded'):
+    the fallback copy of the cache with 'X-Stale-Response', 503 with 'Retry-After' if there is no copy.
+    """
+
+    film_data_in = film_to_load['film 1']
+    endpoint = f'{ENDPOINT_EXACT_SEARCH}/{film_data_in["uuid"]}'
+
+    # 1) The film is cached with its fallback copy, then the cache entry expires (only the copy is left)
+    await es_load(INDEX_NAME, [film_data_in])
+    response = await make_get_request(endpoint)
+    assert response['status'] == HTTPStatus.OK
+
+    async for key in redis_client.scan_iter():
+        if not key.startswith(b'fallback:'):
+            await redis_client.delete(key)
+
+    # 2) No fallback copy: the first failed calls open the circuit, then 503 with 'Retry-After'
+    for _ in range(5):
+        url = f'{test_settings.degraded_app_url}{ENDPOINT_EXACT_SEARCH}/{uuid.uuid4()}'
+        async with a_client.get(url=url) as resp:
+            if resp.status == HTTPStatus.SERVICE_UNAVAILABLE:
+                break
+    assert resp.status == HTTPStatus.SERVICE_UNAVAILABLE
+    assert int(resp.headers['Retry-After']) >= 1
+
+    # 3) The fallback copy
+    response = await make_get_request(endpoint, app_url=test_settings.degraded_app_url)
+
+    assert response['status'] == HTTPStatus.OK
+    assert response['headers']['X-Stale-Response'] == 'true'
+    assert response['body'] == film_data_in
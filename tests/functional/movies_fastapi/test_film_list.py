@@ -1,3 +1,4 @@
+import asyncio
 from http import HTTPStatus
 
 import pytest
@@ -146,6 +147,53 @@ async def test_film_list_pagination(
     assert len(response["body"]) == expected_response['length']
 
 
+async def test_film_list_total_count(
+        es_load,
+        make_get_request,
+):
+    """Check that the total number of films is returned in the headers (not only the current page)."""
+
+    number = 75
+    film_data_in = get_films_to_load(number)
+    endpoint = ENDPOINT_LIST_FILMS
+    params = {'page_number': 2, 'page_size': 50}
+
+    await es_load(INDEX_NAME, film_data_in)
+    response = await make_get_request(endpoint, params)
+
+    assert response['status'] == HTTPStatus.OK
+    assert len(response['body']) == number - 50
+    assert response['headers']['X-Total-Count'] == str(number)
+    assert response['headers']['X-Total-Count-Relation'] == 'eq'
+
+
+async def test_film_list_cursor(
+        es_load,
+        make_get_request,
+):
+    """Check the cursor pagination: the whole list is walked without repetitions."""
+
+    number = 75
+    film_data_in = get_films_to_load(number)
+    endpoint = ENDPOINT_LIST_FILMS
+
+    await es_load(INDEX_NAME, film_data_in)
+
+    received = []
+    cursor = '*'
+    while cursor:
+        response = await make_get_request(endpoint, {'page_size': 20, 'cursor': cursor})
+        assert response['status'] == HTTPStatus.OK
+        received.extend(film['uuid'] for film in response['body'])
+        cursor = response['headers'].get('X-Next-Cursor')
+
+    assert len(received) == number
+    assert set(received) == {film['uuid'] for film in film_data_in}
+
+    response = await make_get_request(endpoint, {'cursor': 'invalid'})
+    assert response['status'] == HTTPStatus.BAD_REQUEST
+
+
 async def test_film_list_cache(
         es_load,
         make_get_request,
@@ -180,3 +228,43 @@ async def test_film_list_cache(
     response = await make_get_request(endpoint, params)
 
     assert len(response['body']) == length_films + add_number
+
+
+async def test_film_list_cache_generation(
+        es_load,
+        make_get_request,
+        make_post_request,
+):
+    """Check that bumping the cache generation of the index retires the cached lists."""
+
+    number = 10
+    params = {'page_size': 50}
+    await es_load(INDEX_NAME, get_films_to_load(number))
+    response = await make_get_request(ENDPOINT_LIST_FILMS, params)
+    assert len(response['body']) == number
+
+    # The new films are not seen: the list is cached
+    add_number = 5
+    await es_load(INDEX_NAME, get_films_to_load(add_number))
+    response = await make_get_request(ENDPOINT_LIST_FILMS, params)
+    assert len(response['body']) == number
+
+    endpoint = f'{test_settings.prefix}/admin/cache/{INDEX_NAME}/generation'
+    response = await make_post_request(endpoint)
+    assert response['status'] == HTTPStatus.FORBIDDEN
+
+    headers = {'X-Admin-Token': test_settings.admin_api_token}
+    response = await make_post_request(endpoint, headers=headers)
+    assert response['status'] == HTTPStatus.OK
+    assert response['body']['index_name'] == INDEX_NAME
+
+    # The other workers get the new generation by pub/sub (not at once): wait for it
+    for _ in range(50):
+        response = await make_get_request(ENDPOINT_LIST_FILMS, params)
+        if len(response['body']) == number + add_number:
+            break
+        await asyncio.sleep(0.1)
+    assert len(response['body']) == number + add_number
+
+    response = await make_post_request(f'{test_settings.prefix}/admin/cache/unknown/generation', headers=headers)
+    assert response['status'] == HTTPStatus.NOT_FOUND
@@ -310,3 +310,18 @@ async def test_film_search_cache(
     response = await make_get_request(endpoint, params)
 
     assert len(response['body']) == length_films + add_number
+
+
+async def test_film_search_concurrency_limit(make_get_request):
+    """
+    Check the concurrency limit: the search requests are rejected with 503 and 'Retry-After'
+    (the API without Elasticsearch allows no search requests, see 'test_movies_fastapi_degraded').
+    """
+
+    response = await make_get_request(
+        ENDPOINT_SEARCH, {'query': 'star'}, app_url=test_settings.degraded_app_url,
+    )
+
+    assert response['status'] == HTTPStatus.SERVICE_UNAVAILABLE
+    assert int(response['headers']['Retry-After']) >= 1
+    assert '"search"' in response['body']['detail']
@@ -0,0 +1,85 @@
+import asyncio
+import uuid
+from copy import deepcopy
+from http import HTTPStatus
+
+from functional.settings import IndexName, test_settings
+from functional.testdata.film_data import film_to_load
+from functional.testdata.genre_data import genre_to_load
+
+ENDPOINT_LIST_GENRES = f'{test_settings.prefix}/{IndexName.GENRES.value}'
+ENDPOINT_LIST_FILMS = f'{test_settings.prefix}/{IndexName.MOVIES.value}'
+
+
+async def load_genre_catalog(es_load, make_get_request, make_post_request, genre_data_in: list[dict]) -> dict:
+    """
+    Load the genres to elastic and wait until the API with the genre catalog (see 'test_movies_fastapi_catalog')
+    reloads its snapshot: it is reloaded on the bump of the 'genres' generation (by pub/sub, not at once).
+    """
+
+    await es_load(IndexName.GENRES.value, genre_data_in)
+    endpoint = f'{test_settings.prefix}/admin/cache/{IndexName.GENRES.value}/generation'
+    response = await make_post_request(endpoint, headers={'X-Admin-Token': test_settings.admin_api_token})
+    assert response['status'] == HTTPStatus.OK
+
+    params = {'page_size': len(genre_data_in)}
+    for _ in range(50):
+        response = await make_get_request(ENDPOINT_LIST_GENRES, params, app_url=test_settings.catalog_app_url)
+        if response['status'] == HTTPStatus.OK and response['body'] == genre_data_in:
+            break
+        await asyncio.sleep(0.1)
+    return response
+
+
+async def test_genre_catalog_list(
+        es_load,
+        make_get_request,
+        make_post_request,
+):
+    """Check that the genre list is served from the genre catalog: in the index order, without elastic."""
+
+    genre_data_in = genre_to_load[:10]
+    response = await load_genre_catalog(es_load, make_get_request, make_post_request, genre_data_in)
+
+    assert response['status'] == HTTPStatus.OK
+    assert response['body'] == genre_data_in
+    stages = {metric.split(';')[0].strip() for metric in response['headers']['Server-Timing'].split(',')}
+    assert 'es' not in stages
+
+    response = await make_get_request(
+        ENDPOINT_LIST_GENRES, {'page_size': 4, 'page_number': 2}, app_url=test_settings.catalog_app_url,
+    )
+
+    assert response['status'] == HTTPStatus.OK
+    assert response['body'] == genre_data_in[4:8]
+
+
+async def test_genre_catalog_film_filter(
+        es_load,
+        make_get_request,
+        make_post_request,
+):
+    """
+    Check that the 'genre_name' filter of films resolves a known genre by the catalog
+    and filters by its uuid, not by the name in the film document.
+    """
+
+    genre = genre_to_load[0]
+    # The film of the genre (its name in the film is out of date)
+    film_by_uuid = deepcopy(film_to_load['film 1'])
+    film_by_uuid['genres'] = [{'uuid': genre['uuid'], 'name': 'Old name'}]
+    # Another genre with the same name
+    film_by_name = deepcopy(film_to_load['film 1'])
+    film_by_name['uuid'] = str(uuid.uuid4())
+    film_by_name['genres'] = [{'uuid': str(uuid.uuid4()), 'name': genre['name']}]
+    await es_load(IndexName.MOVIES.value, [film_by_uuid, film_by_name])
+
+    response = await load_genre_catalog(es_load, make_get_request, make_post_request, genre_to_load[:10])
+    assert response['body'] == genre_to_load[:10]
+
+    response = await make_get_request(
+        ENDPOINT_LIST_FILMS, {'genre_name': genre['name'].lower()}, app_url=test_settings.catalog_app_url,
+    )
+
+    assert response['status'] == HTTPStatus.OK
+    assert [film['uuid'] for film in response['body']] == [film_by_uuid['uuid']]
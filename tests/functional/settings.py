@@ -203,10 +203,28 @@ class TestSettings(BaseSettings):
     project_host: str = Field(default='127.0.0.1')
     project_port: int = Field(default=8001)
 
+    # the same API without Elasticsearch (see test_movies_fastapi_degraded)
+    degraded_project_host: str = Field(default='127.0.0.1')
+    degraded_project_port: int = Field(default=8002)
+
+    # the same API with the genre catalog (see test_movies_fastapi_catalog)
+    catalog_project_host: str = Field(default='127.0.0.1')
+    catalog_project_port: int = Field(default=8003)
+
+    admin_api_token: str = Field(default='test_admin_token')
+
     @property
     def app_url(self) -> HttpUrl:
         return f'http://{self.project_host}:{self.project_port}'
 
+    @property
+    def degraded_app_url(self) -> HttpUrl:
+        return f'http://{self.degraded_project_host}:{self.degraded_project_port}'
+
+    @property
+    def catalog_app_url(self) -> HttpUrl:
+        return f'http://{self.catalog_project_host}:{self.catalog_project_port}'
+
     @property
     def es_url(self) -> HttpUrl:
         return f'http://{self.es_host}:{self.es_port}'